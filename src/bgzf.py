@@ -0,0 +1,105 @@
+"""
+NAME: bgzf.py
+=============
+
+DESCRIPTION
+===========
+
+Reading of BGZF (bgzip) files with virtual offsets.
+Shared by src/vcffilter.py, vcfSetStats.py and vcfcompile.py.
+
+INSTALLATION
+============
+
+Nothing special. Uses only standard libs.
+
+
+VERSION HISTORY
+===============
+
+0.0.1    20261018      Initial version.
+
+LICENCE
+=======
+2018-2019, copyright Sebastian Schmeier
+s.schmeier@gmail.com // https://www.sschmeier.com
+"""
+import struct
+import zlib
+
+__version__ = '0.0.1'
+__date__ = '2026/10/18'
+__email__ = 's.schmeier@gmail.com'
+__author__ = 'Sebastian Schmeier'
+
+
+class BgzfReader(object):
+    """ Minimal reader of BGZF (bgzip) files with virtual offsets.
+
+    tell() returns the virtual offset (compressed block offset << 16 |
+    offset within the uncompressed block) that seek() jumps to directly.
+    Blocks that are not completely written yet are treated as end of file.
+    """
+    def __init__(self, filename):
+        self.fh = open(filename, 'rb')
+        self.block_offset = 0
+        self.next_block = 0
+        self.data = b''
+        self.pos = 0
+
+    @staticmethod
+    def is_bgzf(filename):
+        with open(filename, 'rb') as fh:
+            header = fh.read(16)
+        return len(header) == 16 and header[:4] == b'\x1f\x8b\x08\x04' and \
+            header[12:14] == b'BC'
+
+    def _load(self, offset):
+        """ Load the complete block at compressed offset, else False. """
+        self.fh.seek(offset)
+        header = self.fh.read(18)
+        if len(header) < 18:
+            return False
+        xlen = struct.unpack('<H', header[10:12])[0]
+        bsize = struct.unpack('<H', header[16:18])[0] + 1
+        # 12 bytes header, xlen bytes extra fields (6 already read), the
+        # compressed data and 8 bytes CRC32 and ISIZE
+        block = self.fh.read(bsize - 18)
+        if len(block) < bsize - 18:
+            return False
+        self.block_offset = offset
+        self.next_block = offset + bsize
+        self.data = zlib.decompress(block[xlen - 6:-8], -15)
+        self.pos = 0
+        return True
+
+    def tell(self):
+        if self.pos >= len(self.data):
+            return self.next_block << 16
+        return (self.block_offset << 16) | self.pos
+
+    def seek(self, voffset):
+        self.block_offset = self.next_block = voffset >> 16
+        self.data = b''
+        self.pos = 0
+        if self._load(voffset >> 16):
+            self.pos = voffset & 0xffff
+
+    def readline(self):
+        chunks = []
+        while True:
+            if self.pos >= len(self.data):
+                if not self._load(self.next_block):
+                    break
+                continue  # skips empty blocks, e.g. the EOF marker
+            eol = self.data.find(b'\n', self.pos)
+            if eol != -1:
+                chunks.append(self.data[self.pos:eol + 1])
+                self.pos = eol + 1
+                break
+            chunks.append(self.data[self.pos:])
+            self.pos = len(self.data)
+        return b''.join(chunks)
+
+    def close(self):
+        self.fh.close()
@@ -0,0 +1,110 @@
+"""
+NAME: common.py
+===============
+
+DESCRIPTION
+===========
+
+Input files, checkpoints of long runs and bit counting.
+Shared by src/vcffilter.py, vcfSetStats.py and vcfcompile.py.
+
+INSTALLATION
+============
+
+Nothing special. Uses only standard libs.
+
+
+VERSION HISTORY
+===============
+
+0.0.1    20261018      Initial version.
+
+LICENCE
+=======
+2018-2019, copyright Sebastian Schmeier
+s.schmeier@gmail.com // https://www.sschmeier.com
+"""
+import os
+import os.path
+import gzip
+import bz2
+import pickle
+
+from bgzf import BgzfReader
+
+__version__ = '0.0.1'
+__date__ = '2026/10/18'
+__email__ = 's.schmeier@gmail.com'
+__author__ = 'Sebastian Schmeier'
+
+
+def is_plain_file(filename):
+    """ Uncompressed, non-empty regular file that can be mmap'ed. """
+    if filename in ['-', 'stdin']:
+        return False
+    if filename.split('.')[-1] in ['gz', 'bz2', 'zip']:
+        return False
+    return os.path.isfile(filename) and os.path.getsize(filename) > 0
+
+
+def open_seekable(filename):
+    """ Binary file object with tell() and seek() for checkpoints.
+
+    BGZF files seek directly to a virtual offset, other gzip and bz2 files
+    seek in the uncompressed data, i.e. have to decompress up to there.
+    Raises ValueError for standard input.
+    """
+    if filename in ['-', 'stdin']:
+        raise ValueError(filename)
+    if filename.split('.')[-1] == 'gz':
+        if BgzfReader.is_bgzf(filename):
+            fh = BgzfReader(filename)
+            fh.seek(0)
+            return fh
+        return gzip.open(filename, 'rb')
+    elif filename.split('.')[-1] == 'bz2':
+        return bz2.open(filename, 'rb')
+    return open(filename, 'rb')
+
+
+def file_stamp(filename):
+    """ Size and modification time of a file, to detect changed inputs. """
+    if filename is None or filename in ['-', 'stdin']:
+        return None
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def save_checkpoint(filename, checkpoint):
+    """ Atomically pickle a checkpoint to filename. """
+    tmpfile = '{}.tmp{}'.format(filename, os.getpid())
+    with open(tmpfile, 'wb') as fh:
+        pickle.dump(checkpoint, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpfile, filename)
+
+
+def load_checkpoint(filename, signature):
+    """ Load a checkpoint of a run with the same signature.
+
+    Returns None if there is no checkpoint yet. Raises ValueError with the
+    reason if it can not be read or is from a different run.
+    """
+    if not os.path.isfile(filename):
+        return None
+    try:
+        with open(filename, 'rb') as fh:
+            checkpoint = pickle.load(fh)
+    except (IOError, EOFError, pickle.UnpicklingError):
+        raise ValueError('Could not read checkpoint "{}".'.format(filename))
+    if checkpoint.get('signature') != signature:
+        raise ValueError('Checkpoint "{}" is from a different run.'.format(
+            filename))
+    return checkpoint
+
+
+def popcount(x):
+    """ Number of set bits of an int. """
+    try:
+        return x.bit_count()
+    except AttributeError:  # Python < 3.10
+        return bin(x).count('1')
@@ -0,0 +1,259 @@
+"""
+NAME: sampling.py
+=================
+
+DESCRIPTION
+===========
+
+Random chunks of uncompressed or bgzip'ed vcf-files and the cluster sample
+estimates of --sample-fraction.
+Shared by src/vcffilter.py and vcfSetStats.py.
+
+INSTALLATION
+============
+
+Nothing special. Uses only standard libs.
+
+
+VERSION HISTORY
+===============
+
+0.0.1    20261018      Initial version.
+
+LICENCE
+=======
+2018-2019, copyright Sebastian Schmeier
+s.schmeier@gmail.com // https://www.sschmeier.com
+"""
+import os
+import os.path
+import mmap
+import struct
+import math
+import random
+
+from bgzf import BgzfReader
+
+__version__ = '0.0.1'
+__date__ = '2026/10/18'
+__email__ = 's.schmeier@gmail.com'
+__author__ = 'Sebastian Schmeier'
+
+
+SAMPLE_CHUNK = 1 << 16  # bytes per chunk of --sample-fraction
+BGZF_MAGIC = b'\x1f\x8b\x08\x04'
+
+
+def is_bgzf_header(fh, offset, header):
+    """ Whether header (bytes read at offset) starts a BGZF block.
+
+    Checks the fixed fields written by bgzip and that the block is followed
+    by another one or the end of the file.
+    """
+    if len(header) < 18 or header[:4] != BGZF_MAGIC:
+        return False
+    if header[10:16] != b'\x06\x00BC\x02\x00':
+        return False
+    fh.seek(offset + struct.unpack('<H', header[16:18])[0] + 1)
+    return fh.read(4) in (b'', BGZF_MAGIC)
+
+
+def find_bgzf_block(fh, start, end):
+    """ Offset of the first BGZF block starting in [start, end), else None. """
+    fh.seek(start)
+    buf = fh.read(end - start + 17)
+    p = buf.find(BGZF_MAGIC)
+    while p != -1 and start + p < end:
+        if is_bgzf_header(fh, start + p, buf[p:p + 18]):
+            return start + p
+        p = buf.find(BGZF_MAGIC, p + 1)
+    return None
+
+
+def find_previous_bgzf_block(fh, offset):
+    """ Offset of the BGZF block ending at offset, else None. """
+    start = max(0, offset - 65536)  # maximum size of a block
+    fh.seek(start)
+    buf = fh.read(offset - start)
+    p = buf.rfind(BGZF_MAGIC)
+    while p != -1:
+        header = buf[p:p + 18]
+        if len(header) == 18 and header[10:16] == b'\x06\x00BC\x02\x00' and \
+           start + p + struct.unpack('<H', header[16:18])[0] + 1 == offset:
+            return start + p
+        p = buf.rfind(BGZF_MAGIC, 0, p)
+    return None
+
+
+class ChunkSampler(object):
+    """ Lines of randomly chosen chunks of an uncompressed or bgzip'ed file.
+
+    The file is cut into chunks of SAMPLE_CHUNK bytes (compressed bytes for
+    BGZF) and round(fraction * number of chunks), at least one, are chosen
+    without replacement. A line belongs to the chunk its first byte is in,
+    for BGZF to the chunk the header of that block is in. So every line of
+    the file belongs to exactly one chunk and the chosen chunks are a
+    cluster sample of the lines, without reading anything else but the
+    neighbouring blocks of a chunk.
+
+    Raises ValueError for standard input and empty or other compressed
+    files.
+    """
+    def __init__(self, filename, fraction, seed=None, newline=False):
+        if filename in ['-', 'stdin'] or not os.path.isfile(filename) or \
+           os.path.getsize(filename) == 0:
+            raise ValueError(filename)
+        self.bgzf = BgzfReader.is_bgzf(filename)
+        if not self.bgzf and filename.split('.')[-1] in ['gz', 'bz2', 'zip']:
+            raise ValueError(filename)
+        self.filename = filename
+        self.newline = newline
+        self.num = -(-os.path.getsize(filename) // SAMPLE_CHUNK)
+        n = min(self.num, max(1, int(round(fraction * self.num))))
+        self.chosen = sorted(random.Random(seed).sample(range(self.num), n))
+
+    def __iter__(self):
+        """ Yields the variant lines (bytes, with newline if self.newline)
+        of each chunk.
+        """
+        if self.bgzf:
+            reader = BgzfReader(self.filename)
+            try:
+                for c in self.chosen:
+                    yield self._lines(self._bgzf_chunk(reader, c * SAMPLE_CHUNK))
+            finally:
+                reader.close()
+            return
+
+        with open(self.filename, 'rb') as fh:
+            mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for c in self.chosen:
+                yield self._lines(self._plain_chunk(mm, c * SAMPLE_CHUNK))
+        finally:
+            mm.close()
+
+    def _lines(self, data):
+        lines = [line.rstrip(b'\r') for line in data.split(b'\n')]
+        lines = [line for line in lines
+                 if line and line[0] != 35]  # "#" comment
+        if self.newline:
+            return [line + b'\n' for line in lines]
+        return lines
+
+    @staticmethod
+    def _plain_chunk(mm, start):
+        """ Lines starting in [start, start + SAMPLE_CHUNK) of a mmap. """
+        end = min(start + SAMPLE_CHUNK, len(mm))
+        if start > 0 and mm[start - 1] != 10:  # "\n"
+            p = mm.find(b'\n', start, end)
+            if p == -1:
+                return b''
+            start = p + 1
+        if start >= end:
+            return b''
+        stop = mm.find(b'\n', end - 1)
+        return mm[start:len(mm) if stop == -1 else stop + 1]
+
+    def _bgzf_chunk(self, reader, start):
+        """ Lines starting in the BGZF blocks with a header in the chunk. """
+        end = start + SAMPLE_CHUNK
+        offset = find_bgzf_block(reader.fh, start, end)
+        if offset is None:
+            return b''
+        line_start = self._starts_line(reader, offset)
+        blocks = []
+        while offset < end and reader._load(offset):
+            blocks.append(reader.data)
+            offset = reader.next_block
+        data = b''.join(blocks)
+        if not line_start:
+            p = data.find(b'\n')
+            if p == -1:
+                return b''
+            data = data[p + 1:]
+        if data and not data.endswith(b'\n'):
+            # the last line continues in the following blocks
+            blocks = [data]
+            while reader._load(offset):
+                offset = reader.next_block
+                p = reader.data.find(b'\n')
+                if p != -1:
+                    blocks.append(reader.data[:p + 1])
+                    break
+                blocks.append(reader.data)
+            data = b''.join(blocks)
+        return data
+
+    @staticmethod
+    def _starts_line(reader, offset):
+        """ Whether a line starts with the BGZF block at offset. """
+        while offset > 0:
+            offset = find_previous_bgzf_block(reader.fh, offset)
+            if offset is None or not reader._load(offset):
+                return False
+            if reader.data:  # else the empty EOF block of a concatenated file
+                return reader.data.endswith(b'\n')
+        return True
+
+
+# two-sided 95% quantiles of Student's t distribution for 1 to 30 degrees of
+# freedom, beyond that the Cornish-Fisher expansion around the normal one
+T95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+       2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+       2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+Z95 = 1.959963984540054
+
+
+def t95(df):
+    """ Two-sided 95% quantile of Student's t distribution. """
+    if df <= len(T95):
+        return T95[df - 1]
+    z = Z95
+    return z + (z ** 3 + z) / (4 * df) + \
+        (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * df ** 2)
+
+
+def ratio_estimate(ys, xs, num):
+    """ Ratio sum(ys) / sum(xs) of a cluster sample with 95% confidence interval.
+
+    ys and xs hold the totals of each of the sampled clusters out of num.
+    Uses the linearised variance of a ratio estimator with finite population
+    correction and the t distribution with n - 1 degrees of freedom. Returns
+    (ratio, low, high), the bounds are None if fewer than two clusters were
+    sampled and everything is None if sum(xs) is 0.
+    """
+    n = len(xs)
+    total = sum(xs)
+    if total == 0:
+        return None, None, None
+    r = sum(ys) / total
+    if n < 2:
+        return r, None, None
+    s2 = sum((y - r * x) ** 2 for y, x in zip(ys, xs)) / (n - 1)
+    se = math.sqrt((1.0 - n / num) * s2 / n) / (total / n)
+    return r, max(0.0, r - t95(n - 1) * se), min(1.0, r + t95(n - 1) * se)
+
+
+def total_estimate(xs, num):
+    """ Total of all num clusters estimated from the sampled ones in xs.
+
+    Returns (total, low, high) like ratio_estimate(), the lower bound is at
+    least the number seen in the sample.
+    """
+    n = len(xs)
+    seen = sum(xs)
+    est = seen * num / n
+    if n < 2:
+        return est, None, None
+    mean = seen / n
+    s2 = sum((x - mean) ** 2 for x in xs) / (n - 1)
+    se = num * math.sqrt((1.0 - n / num) * s2 / n)
+    return est, max(seen, est - t95(n - 1) * se), est + t95(n - 1) * se
+
+
+def fmt_estimate(value, scale=1.0):
+    """ Table representation of an estimate, NA if not available. """
+    if value is None:
+        return 'NA'
+    return value * scale
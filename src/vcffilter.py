@@ -29,6 +29,13 @@ TODO
 VERSION HISTORY
 ===============
 
+0.0.8    20261018      Pass rate estimates from sampled chunks.
+0.0.7    20261018      Checkpointed, resumable runs and --output.
+0.0.6    20261018      Adaptive filter order and per-filter statistics.
+0.0.5    20261018      Exclusion of known variants via mmap'ed hash index.
+0.0.4    20261018      Annotation matrix capture and profile evaluation.
+0.0.3    20261018      Threaded, queued output writers.
+0.0.2    20261018      Bytes-level mmap parsing of uncompressed vcf-files.
 0.0.1    20190110      Initial version.
 
 LICENCE
@@ -50,12 +57,25 @@ import time
 import re
 import operator
 import logging
+import mmap
+import queue
+import threading
+import array
+import bisect
+import json
+import hashlib
+import random
+
+from common import is_plain_file, open_seekable, file_stamp, \
+    save_checkpoint, load_checkpoint, popcount
+from sampling import ChunkSampler, ratio_estimate, total_estimate, \
+    fmt_estimate
 
 
 csv.field_size_limit(sys.maxsize)
 
-__version__ = '0.0.1'
-__date__ = '2019/01/10'
+__version__ = '0.0.8'
+__date__ = '2026/10/18'
 __email__ = 's.schmeier@gmail.com'
 __author__ = 'Sebastian Schmeier'
 
@@ -71,8 +91,9 @@ try:
               'warning': Fore.YELLOW,
               'info': ''}
 except ImportError:
-    sys.stderr.write('colorama lib desirable. ' +
-                     'Install with "conda install colorama".\n\n')
+    if __name__ == '__main__':  # not when imported by vcfqc.py
+        sys.stderr.write('colorama lib desirable. ' +
+                         'Install with "conda install colorama".\n\n')
     reset = ''
     colors = {'success': '', 'error': '', 'warning': '', 'info': ''}
 
@@ -166,6 +187,120 @@ def parse_cmdline():
         type=str,
         default=None,
         help='vcf-File to store failed variants in. [default = None]')
+    parser.add_argument('-o',
+        '--output',
+        metavar='FILE',
+        type=str,
+        default=None,
+        help='vcf-File to store passed variants in. ' + \
+        '[default = standard out]')
+    parser.add_argument('--checkpoint',
+        metavar='FILE',
+        type=str,
+        default=None,
+        help='Periodically save the input position, counters and output ' + \
+        'sizes to FILE and resume from it if the run is restarted with ' + \
+        'the same arguments. Outputs are truncated to the saved sizes ' + \
+        'and appended to. Needs --output. FILE is removed when done. ' + \
+        '[default = None]')
+    parser.add_argument('--checkpoint-interval',
+        metavar='SECONDS',
+        type=float,
+        default=60.0,
+        help='Minimum number of seconds between checkpoints. Each ' + \
+        'checkpoint flushes the outputs and, for compressed outputs, ' + \
+        'starts a new gzip/bz2 member. [default = 60]')
+    parser.add_argument('--queue-size',
+        metavar='INT',
+        type=int,
+        default=64,
+        help='Write passed and failed variants from background threads ' + \
+        'through queues holding at most INT batches of lines, so ' + \
+        'compression and I/O overlap with parsing. ' + \
+        '0 writes inline. [default = 64]')
+    parser.add_argument('--save-matrix',
+        metavar='MATRIX',
+        type=str,
+        default=None,
+        help='Extract QD, DP, FS, MQ, ReadPosRankSum and MQRankSum of ' + \
+        'all variants once into the binary MATRIX file and exit. ' + \
+        'Evaluate filter profiles against it with --matrix.')
+    parser.add_argument('--matrix',
+        metavar='MATRIX',
+        type=str,
+        default=None,
+        help='Evaluate filter profiles against a MATRIX from ' + \
+        '--save-matrix instead of parsing FILE. Prints a table of ' + \
+        'passed, failed and not-found counts per profile, counted as ' + \
+        'with --warn.')
+    parser.add_argument('--profiles',
+        metavar='FILE',
+        type=str,
+        default=None,
+        help='Tab-separated filter profiles for --matrix. The header ' + \
+        'names the columns, e.g. "Profile QD FS DP". Missing columns ' + \
+        'take the values of the command line. ' + \
+        '[default: one profile with the command line values]')
+    parser.add_argument('--write-profile',
+        metavar='NAME',
+        type=str,
+        default=None,
+        help='With --matrix, write the variants of FILE passing profile ' + \
+        'NAME to standard out (failed ones to --failed) instead of the ' + \
+        'table. FILE is read again but not parsed for annotations.')
+    parser.add_argument('--exclude-known',
+        metavar='REF',
+        type=str,
+        default=None,
+        help='Drop variants whose CHROM, POS, REF and all ALT alleles ' + \
+        'are in the vcf-file REF (e.g. dbSNP, panel of normals) before ' + \
+        'filtering. [default = None]')
+    parser.add_argument('--known-index',
+        metavar='FILE',
+        type=str,
+        default=None,
+        help='Index of --exclude-known. Built once from REF and ' + \
+        'mmap\'ed on later runs; rebuilt if REF changed. ' + \
+        '[default = REF.known]')
+    parser.add_argument('--adaptive',
+        action="store_true",
+        default=False,
+        help='Reorder the filter tests after a warm-up window so that ' + \
+        'cheap tests rejecting many variants run first. Passed and ' + \
+        'failed variants are the same as with the fixed order, but ' + \
+        'a variant rejected before an annotation not found or not ' + \
+        'numeric is reached gives no warning or error for it and is ' + \
+        'not counted as not found.')
+    parser.add_argument('--warmup',
+        metavar='INT',
+        type=int,
+        default=1000,
+        help='Number of variants for which all tests are run and timed ' + \
+        'to estimate reject rates and costs for --adaptive and ' + \
+        '--filter-stats. At least 1 with --adaptive. [default = 1000]')
+    parser.add_argument('--filter-stats',
+        metavar='FILE',
+        type=str,
+        default=None,
+        help='Write per-filter counts of evaluations, rejections and ' + \
+        'not-found annotations, plus warm-up reject rates and costs, ' + \
+        'to FILE. [default = None]')
+    parser.add_argument('--sample-fraction',
+        metavar='F',
+        type=float,
+        default=None,
+        help='Only read a random fraction F (0 < F <= 1) of the file, in ' + \
+        'chunks of 64 KiB (compressed bytes for bgzip\'ed files), and ' + \
+        'print the estimated pass rates of all filters and of each ' + \
+        'filter among the variants reaching it in the fixed order, with ' + \
+        '95%% confidence intervals, instead of the variants. Needs an ' + \
+        'uncompressed or bgzip\'ed file. [default = read the whole file]')
+    parser.add_argument('--seed',
+        metavar='INT',
+        type=int,
+        default=None,
+        help='Seed for choosing the chunks of --sample-fraction, the same ' + \
+        'seed reads the same chunks. [default = random, printed to stderr]')
     
     # if no arguments supplied print help
     if len(sys.argv) == 1:
@@ -191,126 +326,1162 @@ def load_file(filename):
     return filehandle
 
 
-def main():
-    """ The main funtion. """
-    #logger = logging.getLogger(__name__)
-    args, parser = parse_cmdline()
+def open_output(filename, binary=False, append=False):
+    """ Open an output file, compressed based on its extension. """
+    mode = '{}{}'.format('a' if append else 'w', 'b' if binary else 't')
+    if filename.split('.')[-1] == 'gz':
+        return gzip.open(filename, mode)
+    elif filename.split('.')[-1] == 'bz2':
+        return bz2.open(filename, mode)
+    return open(filename, mode)
 
-    outfileobj = sys.stdout
 
-    if args.failed:
-        if args.failed.split('.')[-1] == 'gz':
-            outfileobj_failed = gzip.open(args.failed, 'wt')
-        elif args.failed.split('.')[-1] == 'bz2':
-            outfileobj_failed = bz2.open(args.failed, 'wt')
+class ThreadedWriter(object):
+    """ Write lines to a file object from a background thread.
+
+    Lines are collected into batches which are handed over through a
+    bounded queue, so the producer blocks if the writer falls behind and
+    memory stays bounded. Errors raised in the writer thread (e.g.
+    BrokenPipeError) are re-raised on the next write(), flush() or close().
+    Lines written so far still go out if the run ends early through
+    error(), as long as finish() or close() is called.
+    """
+    def __init__(self, fileobj, maxsize=64, batchsize=1024):
+        self.fileobj = fileobj
+        self.batchsize = batchsize
+        self.batch = []
+        self.exc = None
+        self.closed = False
+        self.queue = queue.Queue(maxsize=maxsize)
+        # not a daemon, so queued lines are not lost at exit; finish() has
+        # to be called on every way out
+        self.thread = threading.Thread(target=self._run)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is None:
+                    return
+                if self.exc is None:
+                    # '' or b'' depending on the type of lines
+                    self.fileobj.write(batch[0][:0].join(batch))
+            except Exception as e:
+                # keep draining the queue, so the producer does not block
+                self.exc = e
+            finally:
+                self.queue.task_done()
+
+    def _check(self):
+        if self.exc is not None:
+            raise self.exc
+
+    def write(self, line):
+        self.batch.append(line)
+        if len(self.batch) >= self.batchsize:
+            self._check()
+            self.queue.put(self.batch)
+            self.batch = []
+
+    def flush(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+        self.queue.join()
+        self._check()
+        self.fileobj.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.flush()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
+            self.fileobj.close()
+
+    def finish(self):
+        """ Like close(), but never raises, for leaving on errors. """
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ResumableOutput(object):
+    """ Output file that can be continued after a checkpoint.
+
+    checkpoint() closes the file, which completes the gzip/bz2 member
+    written so far, and re-opens it for appending. It returns the size of
+    the file, which a resumed run passes as size to truncate anything
+    written after the checkpoint.
+    """
+    def __init__(self, filename, binary=False, size=None):
+        self.filename = filename
+        self.binary = binary
+        if size is None:
+            self.fileobj = open_output(filename, binary)
         else:
-            outfileobj_failed = open(args.failed, "w") 
-    
+            os.truncate(filename, size)
+            self.fileobj = open_output(filename, binary, append=True)
 
-    reg_qd = re.compile(";QD=(.+?);")
-    reg_dp = re.compile(";DP=(.+?);")
-    reg_fs = re.compile(";FS=(.+?);")
-    reg_mq = re.compile(";MQ=(.+?);")
-    reg_rprs = re.compile(";ReadPosRankSum=(.+?);")
-    reg_mqrs = re.compile(";MQRankSum=(.+?);")
+    def write(self, line):
+        self.fileobj.write(line)
 
-    dict_regs = {"QD":reg_qd,
-                 "DP":reg_dp,
-                 "FS":reg_fs,
-                 "MQ":reg_mq,
-                 "ReadPosRankSum":reg_rprs,
-                 "MQRankSum":reg_mqrs}
+    def flush(self):
+        self.fileobj.flush()
 
-    dict_tests = {"QD":args.QD,
-                  "DP": args.DP,
-                  "FS": args.FS,
-                  "MQ": args.MQ,
-                  "ReadPosRankSum": args.ReadPosRankSum,
-                  "MQRankSum": args.MQRankSum}
-    
+    def checkpoint(self):
+        self.fileobj.close()
+        size = os.path.getsize(self.filename)
+        self.fileobj = open_output(self.filename, self.binary, append=True)
+        return size
+
+    def close(self):
+        self.fileobj.close()
+
+
+def split_info(line):
+    """ INFO column of a data line from iter_*_lines() as bytes. """
+    cols = line.split(b'\t', 8)
+    info = cols[7] if len(cols) > 7 else b''
+    if len(cols) == 8:
+        info = info[:-1]  # INFO is last column, strip newline
+    return info
+
+
+def iter_mmap_lines(filename, start=0, lineno=0, state=None):
+    """ Bytes-level reading of an uncompressed vcf-file.
+
+    The file is mmap'ed and nothing gets decoded. Yields (lineno, info,
+    line) for every line, with info being the INFO column as bytes (None
+    for header lines) and line the raw line including a trailing newline.
+
+    Reading starts at byte offset start with line number lineno. If state
+    is a dict, state["offset"] and state["lineno"] are set to the position
+    of the start of the yielded line, i.e. resuming there yields it again.
+    """
+    with open(filename, 'rb') as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
     try:
-        fileobj = load_file(args.file)
-    except IOError:
-        error('Could not load file "{}". EXIT.'.format(args.file))        
-       
+        size = len(mm)
+        pos = start
+        while pos < size:
+            if state is not None:
+                state['offset'] = pos
+                state['lineno'] = lineno
+            eol = mm.find(b'\n', pos)
+            if eol == -1:
+                line = mm[pos:size] + b'\n'
+                pos = size
+            else:
+                line = mm[pos:eol + 1]
+                pos = eol + 1
+            if line.endswith(b'\r\n'):
+                line = line[:-2] + b'\n'
+            lineno += 1
+            if len(line) == 1:
+                continue
+            if line[0] == 35:  # "#" comment
+                yield lineno, None, line
+                continue
+            yield lineno, split_info(line), line
+    finally:
+        mm.close()
+
+
+def iter_stream_lines(filename, start=0, lineno=0, state=None):
+    """ Like iter_mmap_lines(), for files read through open_seekable().
+
+    Positions in state are the ones of tell() of that file object.
+    """
+    fh = open_seekable(filename)
+    try:
+        if start:
+            fh.seek(start)
+        while True:
+            if state is not None:
+                state['offset'] = fh.tell()
+                state['lineno'] = lineno
+            line = fh.readline()
+            if not line:
+                break
+            if line.endswith(b'\r\n'):
+                line = line[:-2] + b'\n'
+            elif not line.endswith(b'\n'):
+                line += b'\n'
+            lineno += 1
+            if len(line) == 1:
+                continue
+            if line[0] == 35:  # "#" comment
+                yield lineno, None, line
+                continue
+            yield lineno, split_info(line), line
+    finally:
+        fh.close()
+
+
+def iter_csv_lines(fileobj):
+    """ Text-mode reading of a vcf-file with the csv module.
+
+    Yields the same (lineno, info, line) records as iter_mmap_lines(), as
+    str.
+    """
     # delimited file handler
     csv_reader_obj = csv.reader(fileobj, delimiter="\t", quoting=csv.QUOTE_NONE)
     i = 0
-    iYay = 0
-    iNay = 0
-    iV = 0
-    iNotFound = 0
     for a in csv_reader_obj:
         i += 1
-
         if a[0][0] == "#":  # comment
-            outfileobj.write("{}\n".format("\t".join(a)))
-            if args.failed:
-                outfileobj_failed.write("{}\n".format("\t".join(a)))
+            yield i, None, "{}\n".format("\t".join(a))
             continue
+        yield i, a[7], "{}\n".format("\t".join(a))
+
+
+def line_str(line):
+    """ Printable line of a record from iter_*_lines(). """
+    if isinstance(line, bytes):
+        line = line.decode()
+    return line.rstrip('\n')
+
+
+def make_search(name, binary=False):
+    """ Search function for the value of an INFO key.
+
+    Same semantics as the regex ";name=(.+?);". Returns the value (bytes
+    if binary) or None if not found.
+    """
+    if not binary:
+        reg = re.compile(";{}=(.+?);".format(name))
+
+        def search(info):
+            res = reg.search(info)
+            if res:
+                return res.group(1)
+            return None
+        return search
 
-        fail = 0
+    pattern = ';{}='.format(name).encode()
+    plen = len(pattern)
+
+    def search_bytes(info):
+        v = info.find(pattern)
+        if v == -1:
+            return None
+        v += plen
+        e = info.find(b';', v + 1)
+        if e == -1:
+            return None
+        return info[v:e]
+    return search_bytes
+
+
+# Annotations in the order they are tested
+ANNOTATIONS = ["QD", "DP", "FS", "MQ", "ReadPosRankSum", "MQRankSum"]
+MATRIX_MAGIC = b'VCFFILTER-MATRIX\n'
+
+
+def save_matrix(filename, records, dict_regs, binary):
+    """ Extract the annotations of all variants into a binary matrix file.
+
+    Layout: MATRIX_MAGIC, a JSON header line with keys and number of rows,
+    one float64 column per key (NaN if missing) and one missing-bitmap per
+    key (bit r set if the key was not found for variant r).
+    """
+    columns = [array.array('d') for name in ANNOTATIONS]
+    missing = [bytearray() for name in ANNOTATIONS]
+    searches = [dict_regs[name] for name in ANNOTATIONS]
+    nan = float('nan')
+    iV = 0
+    for i, info, line in records:
+        if info is None:  # comment
+            continue
+        r = iV
         iV += 1
-        for name,reg in dict_regs.items():
-            res = reg.search(a[7])
-
-            if not res:
-                outstr = 'Could not find "{}" value. Removed variant.\n'.format(name) + \
-                         'Line ({}): {}'.format(i,'\t'.join(a))
-                if args.warn:
-                    warning(outstr)
-                    iNay += 1
-                    iNotFound += 1
-                    fail = 1
-                else:
-                    error(outstr)                       
+        if r & 7 == 0:
+            for m in missing:
+                m.append(0)
+        for k, search in enumerate(searches):
+            res = search(info)
+            if res is None:
+                columns[k].append(nan)
+                missing[k][r >> 3] |= 1 << (r & 7)
             else:
                 try:
-                    value = float(res.group(1))
+                    columns[k].append(float(res))
                 except ValueError:
-                    error("Could not convert {} to float.".format(res.group(1)))
+                    error("Could not convert {} to float.".format(
+                        res.decode() if binary else res))
 
-                if name == "FS":
-                    if value >= dict_tests[name]:
-                        fail = 1
-                        break
-                else:
-                    if value <= dict_tests[name]:
-                        fail = 1
-                        break
-                        
-        if not fail:
-            iYay += 1
-            # For printing to stdout
-            # SIGPIPE is throwing exception when piping output to other tools
-            # like head. => http://docs.python.org/library/signal.html
-            # use a try - except clause to handle
+    header = {'keys': ANNOTATIONS, 'rows': iV}
+    with open(filename, 'wb') as fh:
+        fh.write(MATRIX_MAGIC)
+        fh.write('{}\n'.format(json.dumps(header)).encode())
+        for col in columns:
+            col.tofile(fh)
+        for m in missing:
+            fh.write(m)
+
+    success("Variants in file: {}".format(iV))
+    for k, name in enumerate(ANNOTATIONS):
+        success("  {} not found for: {}".format(
+            name, popcount(int.from_bytes(missing[k], 'little'))))
+    success('Matrix written to "{}"'.format(filename))
+
+
+def load_matrix(filename):
+    """ Load a matrix of save_matrix().
+
+    Returns (rows, columns, missing) with missing as one int bitset per key.
+    """
+    try:
+        fh = open(filename, 'rb')
+    except IOError:
+        error('Could not load matrix "{}". EXIT.'.format(filename))
+    with fh:
+        if fh.readline() != MATRIX_MAGIC:
+            error('"{}" is not a matrix of --save-matrix. EXIT.'.format(filename))
+        try:
+            header = json.loads(fh.readline().decode())
+            if header['keys'] != ANNOTATIONS:
+                error('Unexpected annotations in "{}". EXIT.'.format(filename))
+            rows = header['rows']
+            columns = []
+            for name in ANNOTATIONS:
+                col = array.array('d')
+                col.fromfile(fh, rows)
+                columns.append(col)
+            nbytes = (rows + 7) // 8
+            missing = []
+            for name in ANNOTATIONS:
+                bitmap = fh.read(nbytes)
+                if len(bitmap) < nbytes:
+                    raise EOFError
+                missing.append(int.from_bytes(bitmap, 'little'))
+        except (EOFError, ValueError, KeyError, TypeError):
+            error('Matrix "{}" is truncated or damaged. EXIT.'.format(filename))
+    return rows, columns, missing
+
+
+def read_profiles(filename, defaults):
+    """ Read filter profiles as list of (name, dict_tests).
+
+    Keys not given in the file take the value of defaults.
+    """
+    profiles = []
+    try:
+        fileobj = load_file(filename)
+    except IOError:
+        error('Could not load file "{}". EXIT.'.format(filename))
+    header = None
+    for a in csv.reader(fileobj, delimiter="\t", quoting=csv.QUOTE_NONE):
+        if not a or a[0].startswith('#'):
+            continue
+        if header is None:
+            header = a
+            for col in header:
+                if col != 'Profile' and col not in ANNOTATIONS:
+                    error('Unknown column "{}" in profiles "{}". EXIT.'.format(
+                        col, filename))
+            continue
+        tests = dict(defaults)
+        name = str(len(profiles) + 1)
+        for col, val in zip(header, a):
+            if col == 'Profile':
+                name = val
+            else:
+                try:
+                    tests[col] = float(val)
+                except ValueError:
+                    error("Could not convert {} to float.".format(val))
+        profiles.append((name, tests))
+    return profiles
+
+
+class MatrixEvaluator(object):
+    """ Evaluate filter profiles against a matrix with int bitsets.
+
+    Per key the found, non-NaN rows are sorted by value once. The rows
+    failing a threshold are then a prefix (suffix for FS) of that order,
+    which is turned into a bitset and cached per distinct threshold. A
+    profile is a handful of AND/OR operations and popcounts on these.
+    """
+    def __init__(self, rows, columns, missing):
+        self.rows = rows
+        self.columns = columns
+        self.missing = missing
+        self.order = []
+        self.values = []
+        self.cache = [{} for name in ANNOTATIONS]
+        for k, col in enumerate(columns):
+            mbytes = missing[k].to_bytes((rows + 7) // 8, 'little')
+            # NaN never fails a test, same as float comparisons
+            order = [r for r in range(rows)
+                     if not (mbytes[r >> 3] >> (r & 7)) & 1
+                     and col[r] == col[r]]
+            order.sort(key=col.__getitem__)
+            self.order.append(order)
+            self.values.append([col[r] for r in order])
+
+    def failing(self, k, threshold):
+        """ Bitset of rows with key k found and failing threshold. """
+        if threshold not in self.cache[k]:
+            order = self.order[k]
+            if ANNOTATIONS[k] == "FS":
+                # value >= threshold fails
+                idx = bisect.bisect_left(self.values[k], threshold)
+                selected = order[idx:]
+            else:
+                # value <= threshold fails
+                idx = bisect.bisect_right(self.values[k], threshold)
+                selected = order[:idx]
+            bits = bytearray((self.rows + 7) // 8)
+            for r in selected:
+                bits[r >> 3] |= 1 << (r & 7)
+            self.cache[k][threshold] = int.from_bytes(bits, 'little')
+        return self.cache[k][threshold]
+
+    def evaluate(self, dict_tests):
+        """ Returns (iYay, iNay, iNotFound, passed bitset).
+
+        Counts are the ones a run with --warn reports: a key that is not
+        found counts as not-found and failed unless an earlier key already
+        failed the variant.
+        """
+        failed_before = 0
+        missing_all = 0
+        iNotFound = 0
+        for k, name in enumerate(ANNOTATIONS):
+            iNotFound += popcount(self.missing[k] & ~failed_before)
+            missing_all |= self.missing[k]
+            failed_before |= self.failing(k, dict_tests[name])
+        rejected = failed_before | missing_all
+        iNay = popcount(rejected)
+        passed = ~rejected & ((1 << self.rows) - 1)
+        return self.rows - iNay, iNay + iNotFound, iNotFound, passed
+
+
+def write_profiles_table(evaluator, profiles):
+    """ Print passed, failed and not-found counts per profile. """
+    outfileobj = sys.stdout
+    # For printing to stdout
+    # SIGPIPE is throwing exception when piping output to other tools
+    # like head. => http://docs.python.org/library/signal.html
+    # use a try - except clause to handle
+    try:
+        outfileobj.write("Profile\t{}\tVariants\tPassed\tFailed\tNotFound\n".format(
+            "\t".join(ANNOTATIONS)))
+        for name, tests in profiles:
+            iYay, iNay, iNotFound, passed = evaluator.evaluate(tests)
+            outfileobj.write("{}\t{}\t{}\t{}\t{}\t{}\n".format(
+                name,
+                "\t".join(["{}".format(tests[key]) for key in ANNOTATIONS]),
+                evaluator.rows, iYay, iNay, iNotFound))
+        # flush output here to force SIGPIPE to be triggered
+        # while inside this try block.
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Python flushes standard streams on exit; redirect remaining output
+        # to devnull to avoid another BrokenPipeError at shut-down
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)  # Python exits with error code 1 on EPIPE
+
+
+PASS, FAIL, MISSING, BAD = 0, 1, 2, 3  # outcomes of a filter test
+
+
+def not_found(name, i, line, warn):
+    """ Warn about, or without warn stop at, an annotation not found. """
+    outstr = 'Could not find "{}" value. Removed variant.\n'.format(name) + \
+             'Line ({}): {}'.format(i, line_str(line))
+    if warn:
+        warning(outstr)
+    else:
+        error(outstr)
+
+
+def test_variant(i, info, line, tests, warn):
+    """ Test a variant in the fixed order of tests.
+
+    tests are (name, search, threshold). Testing stops at the first failing
+    test. Returns (fail, number of annotations not found); with warn every
+    annotation not found fails the variant and counts as one more failure.
+    """
+    fail = 0
+    notfound = 0
+    for name, search, threshold in tests:
+        res = search(info)
+
+        if res is None:
+            not_found(name, i, line, warn)
+            notfound += 1
+            fail = 1
+        else:
+            try:
+                value = float(res)
+            except ValueError:
+                error("Could not convert {} to float.".format(
+                    res.decode() if isinstance(res, bytes) else res))
+
+            if name == "FS":
+                if value >= threshold:
+                    fail = 1
+                    break
+            else:
+                if value <= threshold:
+                    fail = 1
+                    break
+    return fail, notfound
+
+
+class FilterOrder(object):
+    """ Filter tests with per-filter statistics and an adaptive order.
+
+    For the first warmup variants all tests are run and timed, and the
+    outcome is derived in the fixed order, so these variants are handled
+    exactly as by the plain loop. Afterwards the tests run in self.order,
+    which with adaptive is sorted by cost per rejection, up to the first
+    failing one. A variant with an annotation not found or not numeric is
+    walked in the fixed order for the warnings, errors and counts of the
+    plain loop. In the fixed order that is exact. In an adaptive order a
+    variant rejected before that annotation is reached gives no warning or
+    error and is not counted as not found; passed and failed variants are
+    the same as with the fixed order.
+    """
+    def __init__(self, tests, warmup, adaptive=False):
+        # tests: (name, search, threshold) in the fixed order
+        self.tests = tests
+        self.fixed = list(range(len(tests)))
+        self.warmup = warmup
+        self.adaptive = adaptive
+        self.records = 0
+        self.evaluated = [0] * len(tests)
+        self.rejected = [0] * len(tests)
+        self.notfound = [0] * len(tests)
+        self.warm_evaluated = [0] * len(tests)
+        self.warm_rejected = [0] * len(tests)
+        self.warm_seconds = [0.0] * len(tests)
+        self.bad = None
+        self.set_order(self.fixed)
+
+    def set_order(self, order):
+        self.order = order
+        # what the loop of evaluate() needs, without attribute lookups
+        self.plan = [(k, self.tests[k][1], self.tests[k][2],
+                      self.tests[k][0] == "FS") for k in order]
+
+    def test(self, k, info):
+        """ Outcome of test k on an INFO column. """
+        name, search, threshold = self.tests[k]
+        self.evaluated[k] += 1
+        res = search(info)
+        if res is None:
+            self.notfound[k] += 1
+            return MISSING
+        try:
+            value = float(res)
+        except ValueError:
+            self.bad = res
+            return BAD
+        if name == "FS":
+            failed = value >= threshold
+        else:
+            failed = value <= threshold
+        if failed:
+            self.rejected[k] += 1
+            return FAIL
+        return PASS
+
+    def walk_fixed(self, outcome):
+        """ (fail, missing names) in the fixed order from outcome(k). """
+        missing = []
+        for k in self.fixed:
+            res = outcome(k)
+            if res == MISSING:
+                missing.append(self.tests[k][0])
+            elif res == BAD:
+                bad = self.bad
+                error("Could not convert {} to float.".format(
+                    bad.decode() if isinstance(bad, bytes) else bad))
+            elif res == FAIL:
+                return 1, missing
+        return (1 if missing else 0), missing
+
+    def evaluate(self, info):
+        """ Returns (fail, missing names) of a variant. """
+        if self.records < self.warmup:
+            return self.evaluate_warmup(info)
+        # warm: skip this check for the remaining variants
+        self.evaluate = self.evaluate_ordered
+        return self.evaluate_ordered(info)
+
+    def evaluate_ordered(self, info):
+        evaluated = self.evaluated
+        for k, search, threshold, upper in self.plan:
+            res = search(info)
+            if res is None:
+                break
+            try:
+                value = float(res)
+            except ValueError:
+                break
+            evaluated[k] += 1
+            if (value >= threshold) if upper else (value <= threshold):
+                self.rejected[k] += 1
+                return 1, ()
+        else:
+            return 0, ()
+        # not found or not numeric: the tests in front of this one passed
+        passed = self.order[:self.order.index(k)]
+        return self.walk_fixed(
+            lambda j: PASS if j in passed else self.test(j, info))
+
+    def evaluate_warmup(self, info):
+        self.records += 1
+        outcomes = []
+        clock = time.perf_counter
+        test = self.test
+        warm_seconds = self.warm_seconds
+        for k in self.fixed:
+            start = clock()
+            res = test(k, info)
+            warm_seconds[k] += clock() - start
+            self.warm_evaluated[k] += 1
+            if res == FAIL:
+                self.warm_rejected[k] += 1
+            outcomes.append(res)
+        if self.records == self.warmup and self.adaptive:
+            self.reorder()
+        return self.walk_fixed(outcomes.__getitem__)
+
+    def state(self):
+        """ Counters and order, without the search functions. """
+        return {'order': self.order, 'records': self.records,
+                'evaluated': self.evaluated, 'rejected': self.rejected,
+                'notfound': self.notfound,
+                'warm_evaluated': self.warm_evaluated,
+                'warm_rejected': self.warm_rejected,
+                'warm_seconds': self.warm_seconds}
+
+    def restore(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.set_order(self.order)
+
+    def cost_per_rejection(self, k):
+        if not self.warm_rejected[k]:
+            return float('inf')
+        return self.warm_seconds[k] / self.warm_rejected[k]
+
+    def reorder(self):
+        order = sorted(self.fixed, key=lambda k: (self.cost_per_rejection(k), k))
+        self.set_order(order)
+        info("Adaptive filter order: {}".format(
+            ", ".join([self.tests[k][0] for k in order])))
+
+    def write_stats(self, filename):
+        """ Write the per-filter statistics as table. """
+        try:
+            outfileobj = open(filename, 'w')
+        except IOError:
+            error('Could not write file "{}". EXIT.'.format(filename))
+        outfileobj.write("Filter\tPosition\tEvaluated\tRejected\tNotFound" + \
+                         "\tWarmupRejectRate\tWarmupMicroseconds\n")
+        for pos, k in enumerate(self.order):
+            rate = '-'
+            micro = '-'
+            if self.warm_evaluated[k]:
+                rate = self.warm_rejected[k] / self.warm_evaluated[k]
+                micro = self.warm_seconds[k] * 1e6 / self.warm_evaluated[k]
+            outfileobj.write("{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(
+                self.tests[k][0], pos + 1, self.evaluated[k], self.rejected[k],
+                self.notfound[k], rate, micro))
+        outfileobj.close()
+
+
+KNOWN_MAGIC = b'VCFFILTER-KNOWN1'
+KNOWN_HEADER = 64  # bytes, keeps the hashes 8-byte aligned
+
+
+def variant_hash(chrom, pos, ref, alt):
+    """ 64-bit hash of a variant given as bytes. """
+    return int.from_bytes(
+        hashlib.blake2b(b'\t'.join([chrom, pos, ref, alt]),
+                        digest_size=8).digest(), 'little')
+
+
+def line_hashes(line):
+    """ Hashes of the ALT alleles of a vcf line (bytes or str). """
+    if not isinstance(line, bytes):
+        line = line.encode()
+    cols = line.split(b'\t', 5)
+    if len(cols) < 5:
+        return []
+    return [variant_hash(cols[0], cols[1], cols[3], alt)
+            for alt in cols[4].rstrip(b'\r\n').split(b',')]
+
+
+class KnownVariants(object):
+    """ Sorted, packed 64-bit hashes of known variants, mmap'ed from disk.
+
+    Loading is independent of the number of variants, a lookup is a binary
+    search. With 64-bit hashes a false positive is expected about once in
+    1e11 lookups against 100M known variants.
+    """
+    def __init__(self, filename):
+        with open(filename, 'rb') as fh:
+            self.mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.hashes = memoryview(self.mm)[KNOWN_HEADER:].cast('Q')
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, h):
+        i = bisect.bisect_left(self.hashes, h)
+        return i < len(self.hashes) and self.hashes[i] == h
+
+    def is_known(self, line):
+        """ True if all ALT alleles of the line are known. """
+        hashes = line_hashes(line)
+        if not hashes:
+            return False
+        for h in hashes:
+            if h not in self:
+                return False
+        return True
+
+    @staticmethod
+    def source_stamp(reffile):
+        stat = os.stat(reffile)
+        return stat.st_size, stat.st_mtime_ns
+
+    @classmethod
+    def is_current(cls, filename, reffile):
+        """ Index exists and was built from the current REF. """
+        try:
+            with open(filename, 'rb') as fh:
+                header = fh.read(KNOWN_HEADER)
+        except IOError:
+            return False
+        if len(header) < KNOWN_HEADER or not header.startswith(KNOWN_MAGIC):
+            return False
+        stamp = array.array('q', header[len(KNOWN_MAGIC):len(KNOWN_MAGIC) + 16])
+        return tuple(stamp) == cls.source_stamp(reffile)
+
+    @classmethod
+    def build(cls, filename, reffile):
+        """ Hash all variants of REF and write the sorted, unique hashes.
+
+        Hashes are partitioned by their top byte, so only one partition at
+        a time is sorted as a list of ints.
+        """
+        if reffile.split('.')[-1] == 'gz':
+            fileobj = gzip.open(reffile, 'rb')
+        elif reffile.split('.')[-1] == 'bz2':
+            fileobj = bz2.open(reffile, 'rb')
+        else:
+            fileobj = open(reffile, 'rb')
+        buckets = [array.array('Q') for b in range(256)]
+        for line in fileobj:
+            if line[:1] == b'#':
+                continue
+            for h in line_hashes(line):
+                buckets[h >> 56].append(h)
+        fileobj.close()
+
+        tmpfile = '{}.tmp{}'.format(filename, os.getpid())
+        num = 0
+        with open(tmpfile, 'wb') as fh:
+            header = KNOWN_MAGIC + array.array(
+                'q', cls.source_stamp(reffile)).tobytes()
+            fh.write(header.ljust(KNOWN_HEADER, b'\0'))
+            for b in range(256):
+                hashes = array.array('Q', sorted(set(buckets[b])))
+                buckets[b] = None
+                hashes.tofile(fh)
+                num += len(hashes)
+        os.replace(tmpfile, filename)
+        return num
+
+
+def load_known(reffile, filename=None):
+    """ mmap the index of known variants of REF, building it if needed. """
+    if filename is None:
+        filename = '{}.known'.format(reffile)
+    if not os.path.isfile(reffile):
+        error('Could not load file "{}". EXIT.'.format(reffile))
+    if not KnownVariants.is_current(filename, reffile):
+        info('Building index of known variants "{}"'.format(filename))
+        try:
+            num = KnownVariants.build(filename, reffile)
+        except IOError:
+            error('Could not write index "{}". Use --known-index. EXIT.'.format(
+                filename))
+        success('Indexed {} known variant alleles.'.format(num))
+    return KnownVariants(filename)
+
+
+def sample_filter(args):
+    """ Estimate pass rates from randomly chosen chunks of args.file.
+
+    Every variant of a chunk is tested in the fixed order up to the first
+    failing filter, as in a full run, with FilterOrder for the per-filter
+    counts. Next to the overall pass rate the one of each filter among the
+    variants reaching it is estimated; a missing annotation fails its
+    filter. The chunks are the clusters of ratio_estimate().
+    """
+    seed = args.seed
+    if seed is None:
+        seed = random.randrange(1 << 32)
+    try:
+        sampler = ChunkSampler(args.file, args.sample_fraction, seed, True)
+    except ValueError:
+        error('--sample-fraction needs an uncompressed or bgzip\'ed file, ' + \
+              '"{}" is not. EXIT.'.format(args.file))
+    info("Sampling seed: {}".format(seed))
+
+    tests = [(name, make_search(name, True), getattr(args, name))
+             for name in ANNOTATIONS]
+    variants = []
+    passed = []
+    notfound = []
+    filter_variants = [[] for name in ANNOTATIONS]
+    filter_passed = [[] for name in ANNOTATIONS]
+    filter_notfound = [[] for name in ANNOTATIONS]
+    for lines in sampler:
+        iV = 0
+        iYay = 0
+        iNotFound = 0
+        order = FilterOrder(tests, 0)
+        for line in lines:
+            iV += 1
+            fail, missing = order.evaluate(split_info(line))
+            if missing:
+                if not args.warn:
+                    error('Could not find "{}" value.\n'.format(missing[0]) + \
+                          'Line: {}'.format(line_str(line)))
+                iNotFound += 1
+            elif not fail:
+                iYay += 1
+        variants.append(iV)
+        passed.append(iYay)
+        notfound.append(iNotFound)
+        for k in range(len(tests)):
+            filter_variants[k].append(order.evaluated[k])
+            filter_passed[k].append(order.evaluated[k] - order.rejected[k] -
+                                    order.notfound[k])
+            filter_notfound[k].append(order.notfound[k])
+
+    num = sampler.num
+    n = len(variants)
+    success("Sampled chunks: {} of {}, variants read: {}".format(
+        n, num, sum(variants)))
+    if n < 30:
+        warning("Only {} chunks sampled, the confidence intervals are rough."
+                .format(n))
+    est, low, high = total_estimate(variants, num)
+    success("Estimated variants in file: {:.0f} (95% CI {} - {})".format(
+        est, 'NA' if low is None else '{:.0f}'.format(low),
+        'NA' if high is None else '{:.0f}'.format(high)))
+
+    rows = [("all", variants, passed, notfound)]
+    rows.extend(zip(ANNOTATIONS, filter_variants, filter_passed,
+                    filter_notfound))
+    try:
+        sys.stdout.write("Filter\tSampledVariants\tSampledPassed" + \
+                         "\tSampledNotFound\tPassed\tNotFound\tPassRate" + \
+                         "\tPassRateLow\tPassRateHigh\n")
+        for name, vs, yays, nays in rows:
+            rate, low, high = ratio_estimate(yays, vs, num)
+            sys.stdout.write("{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(
+                name, sum(vs), sum(yays), sum(nays),
+                round(sum(yays) * num / n), round(sum(nays) * num / n),
+                fmt_estimate(rate), fmt_estimate(low), fmt_estimate(high)))
+        # flush output here to force SIGPIPE to be triggered
+        # while inside this try block.
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Python flushes standard streams on exit; redirect remaining output
+        # to devnull to avoid another BrokenPipeError at shut-down
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)  # Python exits with error code 1 on EPIPE
+    return
+
+
+def main():
+    """ The main funtion. """
+    #logger = logging.getLogger(__name__)
+    args, parser = parse_cmdline()
+
+    if args.sample_fraction is not None:
+        if args.output or args.failed or args.checkpoint or args.matrix or \
+           args.save_matrix or args.exclude_known or args.adaptive or \
+           args.filter_stats:
+            error("--sample-fraction can not be combined with --output, " + \
+                  "--failed, --checkpoint, matrices, --exclude-known, " + \
+                  "--adaptive or --filter-stats. EXIT.")
+        if not 0 < args.sample_fraction <= 1:
+            error("--sample-fraction has to be in (0, 1]. EXIT.")
+        return sample_filter(args)
+
+    if args.adaptive and args.warmup < 1:
+        error("--adaptive needs a --warmup of at least 1. EXIT.")
+
+    checkpoint = None
+    if args.checkpoint:
+        if args.matrix or args.save_matrix:
+            error("--checkpoint can not be combined with matrices. EXIT.")
+        if not args.output:
+            error("--checkpoint needs --output. EXIT.")
+        if args.file in ['-', 'stdin']:
+            error('Can not checkpoint standard input. EXIT.')
+        # everything that changes what is written
+        signature = {'file': (args.file, file_stamp(args.file)),
+                     'tests': (args.QD, args.FS, args.DP, args.MQ,
+                               args.MQRankSum, args.ReadPosRankSum),
+                     'warn': args.warn, 'output': args.output,
+                     'failed': args.failed,
+                     'known': (args.exclude_known,
+                               file_stamp(args.exclude_known)),
+                     'order': (args.adaptive, args.warmup,
+                               bool(args.filter_stats))}
+        try:
+            checkpoint = load_checkpoint(args.checkpoint, signature)
+        except ValueError as e:
+            warning('{} Start from scratch.'.format(e))
+            checkpoint = None
+        position = {'offset': 0, 'lineno': 0}
+        if checkpoint:
+            info('Resume from checkpoint "{}".'.format(args.checkpoint))
+            position = checkpoint['position']
+        state = dict(position)
+        binary = True
+        if is_plain_file(args.file):
+            records = iter_mmap_lines(args.file, position['offset'],
+                                      position['lineno'], state)
+        else:
             try:
-                outfileobj.write("{}\n".format("\t".join(a)))
-                # flush output here to force SIGPIPE to be triggered
-                # while inside this try block.
-                sys.stdout.flush()
-            except BrokenPipeError:
-                # Python flushes standard streams on exit; redirect remaining output
-                # to devnull to avoid another BrokenPipeError at shut-down
-                devnull = os.open(os.devnull, os.O_WRONLY)
-                os.dup2(devnull, sys.stdout.fileno())
-                sys.exit(1)  # Python exits with error code 1 on EPIPE
+                records = iter_stream_lines(args.file, position['offset'],
+                                            position['lineno'], state)
+            except IOError:
+                error('Could not load file "{}". EXIT.'.format(args.file))
+        outfileobj = ResumableOutput(
+            args.output, binary, checkpoint['sizes'][0] if checkpoint else None)
+    elif is_plain_file(args.file):
+        binary = True
+        records = iter_mmap_lines(args.file)
+        outfileobj = sys.stdout.buffer
+    else:
+        binary = False
+        try:
+            fileobj = load_file(args.file)
+        except IOError:
+            error('Could not load file "{}". EXIT.'.format(args.file))
+        records = iter_csv_lines(fileobj)
+        outfileobj = sys.stdout
+    if args.output and not args.checkpoint:
+        outfileobj = open_output(args.output, binary)
+
+    dict_regs = {"QD": make_search("QD", binary),
+                 "DP": make_search("DP", binary),
+                 "FS": make_search("FS", binary),
+                 "MQ": make_search("MQ", binary),
+                 "ReadPosRankSum": make_search("ReadPosRankSum", binary),
+                 "MQRankSum": make_search("MQRankSum", binary)}
+
+    dict_tests = {"QD":args.QD,
+                  "DP": args.DP,
+                  "FS": args.FS,
+                  "MQ": args.MQ,
+                  "ReadPosRankSum": args.ReadPosRankSum,
+                  "MQRankSum": args.MQRankSum}
+
+    known = None
+    if args.exclude_known:
+        if args.matrix or args.save_matrix:
+            error("--exclude-known can not be combined with matrices. EXIT.")
+        known = load_known(args.exclude_known, args.known_index)
+    iKnown = 0
+
+    if args.save_matrix:
+        save_matrix(args.save_matrix, records, dict_regs, binary)
+        return
+
+    keep = None
+    if args.matrix:
+        rows, columns, missing = load_matrix(args.matrix)
+        evaluator = MatrixEvaluator(rows, columns, missing)
+        if args.profiles:
+            profiles = read_profiles(args.profiles, dict_tests)
+        else:
+            profiles = [("commandline", dict_tests)]
+
+        if args.write_profile is None:
+            write_profiles_table(evaluator, profiles)
+            return
+
+        for name, tests in profiles:
+            if name == args.write_profile:
+                break
         else:
-            iNay += 1
-            if args.failed:
-                outfileobj_failed.write("{}\n".format("\t".join(a)))
+            error('Profile "{}" not found. EXIT.'.format(args.write_profile))
+        iYay, iNay, iNotFound, passed = evaluator.evaluate(tests)
+        keep = passed.to_bytes((rows + 7) // 8, 'little')
+
+    if args.failed:
+        if args.checkpoint:
+            outfileobj_failed = ResumableOutput(
+                args.failed, binary,
+                checkpoint['sizes'][1] if checkpoint else None)
+        else:
+            outfileobj_failed = open_output(args.failed, binary)
+    resumables = []
+    if args.checkpoint:
+        resumables = [outfileobj]
+        if args.failed:
+            resumables.append(outfileobj_failed)
+
+    if args.queue_size > 0:
+        outfileobj = ThreadedWriter(outfileobj, args.queue_size)
+        if args.failed:
+            outfileobj_failed = ThreadedWriter(outfileobj_failed,
+                                               args.queue_size)
+
+    if keep is None:
+        iYay = 0
+        iNay = 0
+        iNotFound = 0
+    iV = 0
+
+    tests = [(name, search, dict_tests[name])
+             for name, search in dict_regs.items()]
+    order = None
+    if args.adaptive or args.filter_stats:
+        order = FilterOrder(tests, args.warmup, args.adaptive)
 
+    if checkpoint:
+        iV, iYay, iNay, iNotFound, iKnown = checkpoint['counters']
+        if order is not None:
+            order.restore(checkpoint['order'])
+    if args.checkpoint:
+        last_checkpoint = time.monotonic()
+
+    writers = [out for out in [outfileobj,
+                               outfileobj_failed if args.failed else None]
+               if isinstance(out, ThreadedWriter)]
+    try:
+        # For printing to stdout
+        # SIGPIPE is throwing exception when piping output to other tools
+        # like head. => http://docs.python.org/library/signal.html
+        # use a try - except clause to handle
+        try:
+            for i, infocol, line in records:
+                if infocol is None:  # comment
+                    outfileobj.write(line)
+                    if args.failed:
+                        outfileobj_failed.write(line)
+                    continue
+
+                fail = 0
+                iV += 1
+                # only look at the clock every 4096 variants
+                if args.checkpoint and iV & 4095 == 0 and \
+                   time.monotonic() - last_checkpoint >= args.checkpoint_interval:
+                    # everything before this variant is written out, so resume
+                    # at the start of its line
+                    position = dict(state)
+                    outfileobj.flush()
+                    if args.failed:
+                        outfileobj_failed.flush()
+                    save_checkpoint(args.checkpoint, {
+                        'signature': signature,
+                        'position': position,
+                        'sizes': [out.checkpoint() for out in resumables],
+                        'counters': (iV - 1, iYay, iNay, iNotFound, iKnown),
+                        'order': order.state() if order is not None else None})
+                    last_checkpoint = time.monotonic()
+                if known is not None and known.is_known(line):
+                    iKnown += 1
+                    continue
+
+                if keep is not None:
+                    # profile evaluated on the matrix
+                    r = iV - 1
+                    if r >= rows:
+                        error('More variants in "{}" than in matrix. EXIT.'.format(
+                            args.file))
+                    if (keep[r >> 3] >> (r & 7)) & 1:
+                        outfileobj.write(line)
+                    elif args.failed:
+                        outfileobj_failed.write(line)
+                    continue
+
+                if order is not None:
+                    fail, missing = order.evaluate(infocol)
+                    if missing:
+                        for name in missing:
+                            not_found(name, i, line, args.warn)
+                        iNay += len(missing)
+                        iNotFound += len(missing)
+                else:
+                    fail, notfound = test_variant(i, infocol, line, tests,
+                                                  args.warn)
+                    iNay += notfound
+                    iNotFound += notfound
+
+                if not fail:
+                    iYay += 1
+                    outfileobj.write(line)
+                else:
+                    iNay += 1
+                    if args.failed:
+                        outfileobj_failed.write(line)
+            # flush output here to force SIGPIPE to be triggered
+            # while inside this try block.
+            outfileobj.flush()
+        except BrokenPipeError:
+            # Python flushes standard streams on exit; redirect remaining output
+            # to devnull to avoid another BrokenPipeError at shut-down
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            sys.exit(1)  # Python exits with error code 1 on EPIPE
+    except BaseException:
+        # error(), EPIPE or Ctrl-C: still write out the queued lines and
+        # stop the writer threads
+        for out in writers:
+            out.finish()
+        raise
+
+    if args.failed:
+        outfileobj_failed.close()
+    outfileobj.close()
+
+    if keep is not None and iV != rows:
+        error('Less variants in "{}" than in matrix. EXIT.'.format(args.file))
 
     success("Variants in file: {}".format(iV))
+    if known is not None:
+        success("Variants excluded as known: {}".format(iKnown))
     success("Variants passed all filters: {}".format(iYay))
     success("Variants failed at least one filter: {}".format(iNay))
     success("  Of those at least one filter could not been found for: {}".format(iNotFound))
+    if args.adaptive and order.records < args.warmup:
+        warning("Only {} variants tested, fewer than --warmup; ".format(
+            order.records) + "the fixed filter order was kept.")
+    if args.filter_stats:
+        order.write_stats(args.filter_stats)
     
     
     
     # ------------------------------------------------------
-    outfileobj.close()
+    if args.checkpoint and os.path.isfile(args.checkpoint):
+        # outputs complete, a restart should start from scratch
+        os.remove(args.checkpoint)
     return
 
 
@@ -29,6 +29,10 @@ TODO
 VERSION HISTORY
 ===============
 
+0.1.5    20261018    Estimates from randomly sampled chunks (--sample-fraction)
+0.1.4    20261018    Follow mode and state file for growing vcf-files
+0.1.3    20261018    Single-pass QUAL threshold sweep
+0.1.2    20261018    Bytes-level mmap parsing of uncompressed vcf-files
 0.1.1    20200429    Pct with ID
 0.0.2    20191107    Sort and infer added
 0.0.1    20191106    Initial version.
@@ -52,11 +56,21 @@ import time
 import re
 import operator
 import itertools
+import mmap
+import array
+import bisect
+import pickle
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from bgzf import BgzfReader
+from common import is_plain_file
+from sampling import ChunkSampler, ratio_estimate, total_estimate, fmt_estimate
 
 csv.field_size_limit(sys.maxsize)
 
-__version__ = "0.0.2"
-__date__ = "2019/11/07"
+__version__ = "0.1.5"
+__date__ = "2026/10/18"
 __email__ = "s.schmeier@protonmail.com"
 __author__ = "Sebastian Schmeier"
 
@@ -75,9 +89,10 @@ try:
         "info": "",
     }
 except ImportError:
-    sys.stderr.write(
-        "colorama lib desirable. " + 'Install with "conda install colorama".\n\n'
-    )
+    if __name__ == "__main__":  # not when imported by vcfqc.py
+        sys.stderr.write(
+            "colorama lib desirable. " + 'Install with "conda install colorama".\n\n'
+        )
     reset = ""
     colors = {"success": "", "error": "", "warning": "", "info": ""}
 
@@ -113,6 +128,30 @@ def info(text, log=sys.stderr, repeat=False):
     alert("info", text, log)
 
 
+def parse_thresholds(text):
+    """ Parse a QUAL sweep given as comma-separated list or START:STOP:STEP. """
+    try:
+        if ":" in text:
+            start, stop, step = [float(x) for x in text.split(":")]
+            if step <= 0:
+                raise ValueError
+            thresholds = []
+            k = 0
+            # multiply instead of accumulating to avoid drift
+            while start + k * step <= stop + step * 1e-9:
+                thresholds.append(start + k * step)
+                k += 1
+        else:
+            thresholds = [float(x) for x in text.split(",") if x.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'invalid QUAL sweep "{}", use e.g. 0,10,20 or 0:100:10'.format(text)
+        )
+    if not thresholds:
+        raise argparse.ArgumentTypeError('empty QUAL sweep "{}"'.format(text))
+    return thresholds
+
+
 def parse_cmdline():
     """ Parse command-line args. """
     # parse cmd-line ----------------------------------------------------------
@@ -133,6 +172,14 @@ def parse_cmdline():
         default=0.0,
         help="Only consider variants with a QUAL value equal or greater than this value. [default = 0]",
     )
+    parser.add_argument(
+        "--qual-sweep",
+        dest="qual_sweep",
+        metavar="LIST",
+        type=parse_thresholds,
+        default=None,
+        help="Compile the table for several QUAL thresholds in one pass over the file, e.g. 0,10,20 or START:STOP:STEP (STOP inclusive) like 0:100:10. Adds a leading QUAL column. Can not be combined with --qual.",
+    )
     parser.add_argument(
         "--snpeffType",
         metavar="TYPE",
@@ -151,6 +198,48 @@ def parse_cmdline():
         default=False,
         help="Sort by combination names. Can be used to get normalised output together with --infer. [default: sorted by number of variants]",
     )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        default=False,
+        help="Keep watching a growing vcf-file (uncompressed or bgzip'ed) and print the table again whenever complete records were appended. Only new records are read. Stop with Ctrl-C. Can not be combined with --qual-sweep.",
+    )
+    parser.add_argument(
+        "--interval",
+        metavar="SECONDS",
+        type=float,
+        default=30.0,
+        help="Seconds between checks for new records with --follow. [default = 30]",
+    )
+    parser.add_argument(
+        "--idle-exit",
+        dest="idle_exit",
+        metavar="SECONDS",
+        type=float,
+        default=0.0,
+        help="Stop following if the file did not grow for SECONDS. [default = 0, never stop]",
+    )
+    parser.add_argument(
+        "--state",
+        metavar="FILE",
+        default=None,
+        help="Keep counters and file position in FILE, so that the next run with the same arguments only reads the records appended since. Works with and without --follow. [default: counters kept in memory only]",
+    )
+    parser.add_argument(
+        "--sample-fraction",
+        dest="sample_fraction",
+        metavar="F",
+        type=float,
+        default=None,
+        help="Only read a random fraction F (0 < F <= 1) of the file, in chunks of 64 KiB (compressed bytes for bgzip'ed files), and print estimated numbers and percentages of the caller sets with 95%% confidence intervals. Needs an uncompressed or bgzip'ed file. Can not be combined with --qual-sweep, --follow or --state. [default: read the whole file]",
+    )
+    parser.add_argument(
+        "--seed",
+        metavar="INT",
+        type=int,
+        default=None,
+        help="Seed for choosing the chunks of --sample-fraction, the same seed reads the same chunks. [default: random, printed to standard error]",
+    )
 
     # if no arguments supplied print help
     if len(sys.argv) == 1:
@@ -176,146 +265,425 @@ def load_file(filename):
     return filehandle
 
 
-def main():
-    """ The main funtion. """
-    args, parser = parse_cmdline()
+def iter_mmap_records(filename, need_info=False):
+    """ Bytes-level reading of an uncompressed vcf-file.
 
-    if args.snpeffType:
-        reg_genes = re.compile("\|(HIGH|MODERATE|LOW|MODIFIER)\|(.+?)\|")
+    The file is mmap'ed and lines are handled as bytes. Only ID, QUAL and
+    the "set=" value of the INFO column get decoded.
 
+    Yields (qual, vid, callset, info, line) for every variant line. callset
+    has the same semantics as the regex "set=(.+?)(?:;|$)" and is None if
+    not found, info is the decoded INFO column if need_info is set and line
+    is the raw line as bytes.
+    """
+    with open(filename, "rb") as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
     try:
-        fileobj = load_file(args.file)
-    except IOError:
-        error('Could not load file "{}". EXIT.'.format(f))
+        size = len(mm)
+        pos = 0
+        while pos < size:
+            eol = mm.find(b"\n", pos)
+            if eol == -1:
+                eol = size
+            line = mm[pos:eol]
+            pos = eol + 1
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            if not line or line[0] == 35:  # "#" comment
+                continue
+            yield parse_record(line, need_info)
+    finally:
+        mm.close()
+
+
+def parse_record(line, need_info=False):
+    """ (qual, vid, callset, info, line) of a variant line given as bytes. """
+    cols = line.split(b"\t", 8)
+    if len(cols) < 8:
+        cols.extend([b""] * (8 - len(cols)))
+    infob = cols[7]
+    callset = None
+    v = infob.find(b"set=")
+    if v != -1 and v + 4 < len(infob):
+        e = infob.find(b";", v + 5)
+        if e == -1:
+            e = len(infob)
+        callset = infob[v + 4 : e].decode()
+    info = infob.decode() if need_info else None
+    return cols[5].decode(), cols[2].decode(), callset, info, line
+
+
+def iter_appended_records(fileobj, start, state, need_info=False):
+    """ Variant records of the complete lines of fileobj after start.
+
+    fileobj is a binary file object with seek(), tell() and readline().
+    state["offset"] is set to the position after the last complete line, a
+    line without trailing newline is left for a later call. Yields the same
+    records as iter_mmap_records().
+    """
+    fileobj.seek(start)
+    state["offset"] = start
+    while True:
+        line = fileobj.readline()
+        if not line.endswith(b"\n"):
+            break
+        state["offset"] = fileobj.tell()
+        line = line.rstrip(b"\r\n")
+        if not line or line[0] == 35:  # "#" comment
+            continue
+        yield parse_record(line, need_info)
 
-    reg_set = re.compile("set=(.+?)(?:;|$)")
 
+def iter_csv_records(fileobj, reg_set):
+    """ Text-mode reading of a vcf-file with the csv module.
+
+    Yields the same (qual, vid, callset, info, line) records as
+    iter_mmap_records(), with line being the list of columns.
+    """
     csv_reader_obj = csv.reader(fileobj, delimiter="\t", quoting=csv.QUOTE_NONE)
-    i = 0  # number of variants in file
-    iDroppedQual = 0
-    iDroppedEff = 0
-    iConsidered = 0
-    iAnnotated = 0
-    callerSets = {}
-    callerSetsAnno = {}
     for a in csv_reader_obj:
         if a[0][0] == "#":  # comment
             continue
+        res_set = reg_set.search(a[7])
+        callset = res_set.groups()[0] if res_set else None
+        yield a[5], a[2], callset, a[7], a
+
+
+def line_str(line):
+    """ Printable line of a record from iter_*_records(). """
+    if isinstance(line, bytes):
+        return line.decode()
+    return "\t".join(line)
+
+
+class SetCounter(object):
+    """ Running counts of variants per caller set.
+
+    update() can be called repeatedly with further records, e.g. the ones
+    appended to a growing file.
+    """
+
+    def __init__(self, qual=0.0):
+        self.qual = qual
+        self.i = 0  # number of variants in file
+        self.iDroppedQual = 0
+        self.iDroppedEff = 0
+        self.iConsidered = 0
+        self.iAnnotated = 0
+        self.callerSets = {}
+        self.callerSetsAnno = {}
+
+    def update(self, records, reg_genes=None):
+        """ Count records, returns the number of records read. """
+        minQual = self.qual
+        callerSets = self.callerSets
+        callerSetsAnno = self.callerSetsAnno
+        i = 0
+        iDroppedQual = 0
+        iDroppedEff = 0
+        iConsidered = 0
+        iAnnotated = 0
+        try:
+            for qual, vid, callset, info, line in records:
+                i += 1
+
+                if qual == ".":
+                    if minQual > 0:
+                        iDroppedQual += 1
+                        continue
+                else:
+                    qual = float(qual)  # quality value
+                    if qual < minQual:
+                        iDroppedQual += 1
+                        continue
 
-        i += 1
-
-        if a[5] == ".":
-            if args.qual > 0:
-                iDroppedQual += 1
-                continue
-        else:
-            qual = float(a[5])  # quality value
-            if qual < args.qual:
-                iDroppedQual += 1
-                continue
-
-        if args.snpeffType:
-            res_genes = reg_genes.findall(a[7])
-            if len(res_genes) == 0:
-                iDroppedEff += 1
-                continue
-
-        iConsidered += 1
+                if reg_genes:
+                    res_genes = reg_genes.findall(info)
+                    if len(res_genes) == 0:
+                        iDroppedEff += 1
+                        continue
 
+                iConsidered += 1
+
+                if callset is None:
+                    error(
+                        "Could not extract set from line:\n{}\n".format(
+                            line_str(line)
+                        )
+                    )
+                callers = callset.split("-")
+                callers.sort()
+                callSet = tuple(callers)
+                callerSets[callSet] = callerSets.get(callSet, 0) + 1
+
+                if callSet not in callerSetsAnno:
+                    callerSetsAnno[callSet] = 0
+                # annotation with snp id?
+                if vid != ".":
+                    callerSetsAnno[callSet] += 1
+                    iAnnotated += 1
+        finally:
+            self.i += i
+            self.iDroppedQual += iDroppedQual
+            self.iDroppedEff += iDroppedEff
+            self.iConsidered += iConsidered
+            self.iAnnotated += iAnnotated
+        return i
+
+    def report(self, args, close=True):
+        """ Print the stats to standard error and the table to standard out. """
+        success("Variants in file: {}".format(self.i))
+        success("Number of variants dropped due to QUAL: {}".format(self.iDroppedQual))
+        success("Number of variants dropped due to EFF: {}".format(self.iDroppedEff))
+
+        iNumSets = len(self.callerSets.keys())
+        success("Number of combination of callers found in file: {}".format(iNumSets))
+
+        # Infer missing combinations of callers, on a copy to keep the counts
+        # of a followed file untouched
+        callerSets = dict(self.callerSets)
+        if args.infer:
+            infer_sets(callerSets)
+
+        write_tables(
+            [
+                (
+                    None,
+                    table_rows(
+                        callerSets, self.callerSetsAnno, self.iConsidered, args.sort
+                    ),
+                )
+            ],
+            close,
+        )
 
-        res_set = reg_set.search(a[7])
-        if not res_set:
-            error("Could not extract set from line:\n{}\n".format("\t".join(a)))
-        callers = res_set.groups()[0].split("-")
-        callers.sort()
-        callSet = tuple(callers)
-        callerSets[callSet] = callerSets.get(callSet, 0) + 1
-        
-        if callSet not in callerSetsAnno:
-            callerSetsAnno[callSet] = 0
-        # annotation with snp id?
-        if a[2] != ".":
-            callerSetsAnno[callSet] += 1
-            iAnnotated += 1
 
+def file_id(filename):
+    """ Device and inode of a file, to notice a replaced file. """
+    stat = os.stat(filename)
+    return stat.st_dev, stat.st_ino
 
 
-    success("Variants in file: {}".format(i))
-    success("Number of variants dropped due to QUAL: {}".format(iDroppedQual))
-    success("Number of variants dropped due to EFF: {}".format(iDroppedEff))
+def load_state(filename, signature):
+    """ (file id, offset, counter) of an earlier run with the same signature. """
+    if not os.path.isfile(filename):
+        return None
+    try:
+        with open(filename, "rb") as fh:
+            state = pickle.load(fh)
+    except (IOError, EOFError, pickle.UnpicklingError):
+        warning('Could not read state "{}". Start from scratch.'.format(filename))
+        return None
+    if state.get("signature") != signature:
+        warning(
+            'State "{}" is from a different file or run. Start from scratch.'.format(
+                filename
+            )
+        )
+        return None
+    return state["fid"], state["offset"], state["counter"]
+
+
+def save_state(filename, signature, fid, offset, counter):
+    """ Atomically save the state. """
+    tmpfile = "{}.tmp{}".format(filename, os.getpid())
+    with open(tmpfile, "wb") as fh:
+        pickle.dump(
+            {
+                "signature": signature,
+                "fid": fid,
+                "offset": offset,
+                "counter": counter,
+            },
+            fh,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    os.replace(tmpfile, filename)
+
+
+def follow(args, reg_genes=None):
+    """ Count the records of a growing file incrementally.
+
+    Only complete lines appended since the last update are read, so the
+    cost of an update depends on the new data only. With --state the
+    position and counters survive between runs. A file that shrank or was
+    replaced is counted again from the start.
+    """
+    if args.file in ["-", "stdin"]:
+        error("Can not follow standard input. EXIT.")
+    ext = args.file.split(".")[-1]
+    signature = {
+        "file": os.path.abspath(args.file),
+        "qual": args.qual,
+        "snpeffType": args.snpeffType,
+    }
 
-    iNumSets = len(callerSets.keys())
-    success("Number of combination of callers found in file: {}".format(iNumSets))
+    offset = 0
+    counter = SetCounter(args.qual)
+    fid = None
+    if args.state:
+        loaded = load_state(args.state, signature)
+        if loaded:
+            fid, offset, counter = loaded
+            success("Resume at {} variants.".format(counter.i))
+
+    state = {"offset": offset}
+    lastGrowth = time.monotonic()
+    reported = False
+    try:
+        while True:
+            if not os.path.isfile(args.file):
+                if not args.follow:
+                    error('Could not load file "{}". EXIT.'.format(args.file))
+                time.sleep(args.interval)
+                continue
 
-    # Infer missing combinations of callers
-    if args.infer:
-        singleCallers = []
-        # get the single callers
-        for t in callerSets:
-            if len(t) == 1 and t[0] != "Intersection":
-                singleCallers.append(t[0])
-        singleCallers.sort()  # ensures lexcographical sort in subsets
-        numCallers = len(singleCallers)
-
-        # if we likely miss some combinations, add them with zero
-        if iNumSets < (2 ** numCallers) - 1:  # do not count empty set
-            warning(
-                "Inferred a total of {} caller combinations.".format(
-                    (2 ** numCallers) - 1
+            if ext in ["gz", "bgz"]:
+                if not BgzfReader.is_bgzf(args.file):
+                    error("Can only follow uncompressed or bgzip'ed files. EXIT.")
+                fileobj = BgzfReader(args.file)
+                size = os.path.getsize(args.file) << 16
+            elif ext in ["bz2", "zip"]:
+                error("Can only follow uncompressed or bgzip'ed files. EXIT.")
+            else:
+                fileobj = open(args.file, "rb")
+                size = os.path.getsize(args.file)
+
+            if fid is not None and (fid != file_id(args.file) or size < state["offset"]):
+                warning("File was replaced or truncated. Count from the start.")
+                state["offset"] = 0
+                counter = SetCounter(args.qual)
+            fid = file_id(args.file)
+
+            try:
+                num = counter.update(
+                    iter_appended_records(
+                        fileobj, state["offset"], state, bool(args.snpeffType)
+                    ),
+                    reg_genes,
                 )
+            finally:
+                fileobj.close()
+
+            if num or not reported:
+                counter.report(args, close=False)
+                reported = True
+            if num:
+                lastGrowth = time.monotonic()
+            if args.state:
+                save_state(args.state, signature, fid, state["offset"], counter)
+
+            if not args.follow:
+                break
+            if args.idle_exit and time.monotonic() - lastGrowth >= args.idle_exit:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    sys.stdout.close()
+
+
+def infer_sets(callerSets):
+    """ Add missing combinations of single callers with zero variants. """
+    iNumSets = len(callerSets.keys())
+    singleCallers = []
+    # get the single callers
+    for t in callerSets:
+        if len(t) == 1 and t[0] != "Intersection":
+            singleCallers.append(t[0])
+    singleCallers.sort()  # ensures lexcographical sort in subsets
+    numCallers = len(singleCallers)
+
+    # if we likely miss some combinations, add them with zero
+    if iNumSets < (2 ** numCallers) - 1:  # do not count empty set
+        warning(
+            "Inferred a total of {} caller combinations.".format(
+                (2 ** numCallers) - 1
             )
-            warning(
-                "Try to find the missing {} combinations.".format(
-                    (2 ** numCallers) - 1 - iNumSets
-                )
+        )
+        warning(
+            "Try to find the missing {} combinations.".format(
+                (2 ** numCallers) - 1 - iNumSets
             )
-            for i in range(1, numCallers + 1):
-                for comb in itertools.combinations(singleCallers, i):
-                    # Intersection present? Its the combination of all callers
-                    if len(comb) == numCallers and ("Intersection",) not in callerSets:
-                        warning("Combination added: {} as 'Intersection'".format(comb))
-                        callerSets[("Intersection",)] = 0
-                        continue
-                    elif len(comb) == numCallers and ("Intersection",) in callerSets:
-                        continue
-
-                    if comb not in callerSets:
-                        warning("Combination added: {}".format(comb))
-                        callerSets[tuple(comb)] = 0
-
-    if args.sort:
+        )
+        for i in range(1, numCallers + 1):
+            for comb in itertools.combinations(singleCallers, i):
+                # Intersection present? Its the combination of all callers
+                if len(comb) == numCallers and ("Intersection",) not in callerSets:
+                    warning("Combination added: {} as 'Intersection'".format(comb))
+                    callerSets[("Intersection",)] = 0
+                    continue
+                elif len(comb) == numCallers and ("Intersection",) in callerSets:
+                    continue
+
+                if comb not in callerSets:
+                    warning("Combination added: {}".format(comb))
+                    callerSets[tuple(comb)] = 0
+
+
+def table_rows(callerSets, callerSetsAnno, iConsidered, sort=False):
+    """ Rows of the caller set table.
+
+    Sorted by combination names if sort is set, by number of variants
+    otherwise.
+    """
+    if sort:
         callerSets_sorted = sorted(callerSets.items(), key=operator.itemgetter(0))
     else:  # sort according to number of variants
         callerSets_sorted = sorted(callerSets.items(), key=operator.itemgetter(1))
         callerSets_sorted.reverse()
 
-    outfileobj = sys.stdout
+    rows = []
+    for t in callerSets_sorted:
+        anno = 0
+        if t[0] in callerSetsAnno:
+            anno = callerSetsAnno[t[0]]
+
+        cset = "|".join(list(t[0]))
+        if cset == "Intersection":
+            numC = "-1"
+        else:
+            numC = len(cset.split("|"))
+        num = t[1]
+        pct = num * 100.0 / iConsidered
+        pctanno = 0.0
+        if num > 0:
+            pctanno = anno * 100.0 / num  # pct of number SNPs called with particular of caller
+
+        rows.append("{}\t{}\t{}\t{}\t{}\t{}".format(cset, numC, num, pct, anno, pctanno))
+    return rows
+
+
+TABLE_HEADER = "Set\tNumCallers\tNumVars\tPctVars\tNumAnno\tPctAnnotated"
+
+
+def write_tables(
+    tables, close=True, outfileobj=None, column="QUAL", header=TABLE_HEADER
+):
+    """ Print tables of (label, rows) to outfileobj (default standard out).
+
+    If label is not None it is added as leading column named column, header
+    is the first line. The output is closed afterwards unless close is False.
+    """
+    if tables and tables[0][0] is not None:
+        header = "{}\t{}".format(column, header)
+
+    if outfileobj is None:
+        outfileobj = sys.stdout
     # For printing to stdout
     # SIGPIPE is throwing exception when piping output to other tools
     # like head. => http://docs.python.org/library/signal.html
     # use a try - except clause to handle
     try:
-        outfileobj.write("Set\tNumCallers\tNumVars\tPctVars\tNumAnno\tPctAnnotated\n")
-        for t in callerSets_sorted:
-            anno = 0
-            if t[0] in callerSetsAnno:
-                anno = callerSetsAnno[t[0]]
-
-            cset = "|".join(list(t[0]))
-            if cset == "Intersection":
-                numC = "-1"
-            else:
-                numC = len(cset.split("|"))
-            num = t[1]
-            pct = num * 100.0 / iConsidered
-            pctanno = 0.0
-            if num > 0:
-                pctanno = anno * 100.0 / num  # pct of number SNPs called with particular of caller
-
-            outfileobj.write("{}\t{}\t{}\t{}\t{}\t{}\n".format(cset, numC, num, pct, anno, pctanno))
+        outfileobj.write("{}\n".format(header))
+        for label, rows in tables:
+            for row in rows:
+                if label is not None:
+                    row = "{}\t{}".format(label, row)
+                outfileobj.write("{}\n".format(row))
         # flush output here to force SIGPIPE to be triggered
         # while inside this try block.
-        sys.stdout.flush()
+        outfileobj.flush()
     except BrokenPipeError:
         # Python flushes standard streams on exit; redirect remaining output
         # to devnull to avoid another BrokenPipeError at shut-down
@@ -324,7 +692,285 @@ def main():
         sys.exit(1)  # Python exits with error code 1 on EPIPE
 
     # ------------------------------------------------------
-    outfileobj.close()
+    if close:
+        outfileobj.close()
+
+
+def count_ge(values, threshold):
+    """ Number of values in a sorted array that are >= threshold. """
+    return len(values) - bisect.bisect_left(values, threshold)
+
+
+def qual_sweep(args, records, reg_genes=None):
+    """ Compile the caller set table for every threshold of args.qual_sweep.
+
+    Reads the file once and keeps the QUAL values per caller set as sorted
+    arrays (all and annotated ones) plus counts of missing QUAL values, so
+    each threshold is a binary search per set. A missing QUAL (".") passes
+    thresholds <= 0 only, as with --qual.
+
+    Sets with the same number of variants are in the order of a single
+    --qual run, i.e. of their first variant passing the threshold. For this
+    each set also keeps every QUAL value that is higher than all before it,
+    with its record number.
+    """
+    lowest = min(args.qual_sweep)
+    i = 0  # number of variants in file
+    # set -> [quals, annotated quals, num ".", num "." annotated,
+    #         increasing maximum quals, their record numbers,
+    #         first record number of "."]
+    setQuals = {}
+    effQuals = array.array("d")  # QUAL of variants dropped due to EFF
+    iEffMissing = 0
+    for qual, vid, callset, info, line in records:
+        i += 1
+
+        if qual == ".":
+            if lowest > 0:
+                continue
+            qual = None
+        else:
+            qual = float(qual)  # quality value
+            if qual < lowest:
+                continue
+
+        if reg_genes:
+            res_genes = reg_genes.findall(info)
+            if len(res_genes) == 0:
+                if qual is None:
+                    iEffMissing += 1
+                else:
+                    effQuals.append(qual)
+                continue
+
+        if callset is None:
+            error("Could not extract set from line:\n{}\n".format(line_str(line)))
+        callers = callset.split("-")
+        callers.sort()
+        callSet = tuple(callers)
+        if callSet not in setQuals:
+            setQuals[callSet] = [
+                array.array("d"), array.array("d"), 0, 0, [float("-inf")], [0], None
+            ]
+        accu = setQuals[callSet]
+        if qual is None:
+            accu[2] += 1
+            if accu[6] is None:
+                accu[6] = i
+            if vid != ".":
+                accu[3] += 1
+        else:
+            accu[0].append(qual)
+            if qual > accu[4][-1]:
+                accu[4].append(qual)
+                accu[5].append(i)
+            # annotation with snp id?
+            if vid != ".":
+                accu[1].append(qual)
+
+    success("Variants in file: {}".format(i))
+
+    effQuals = sorted(effQuals)
+    for accu in setQuals.values():
+        accu[0] = sorted(accu[0])
+        accu[1] = sorted(accu[1])
+
+    tables = []
+    for threshold in args.qual_sweep:
+        withMissing = threshold <= 0
+        found = []  # (first record passing, set)
+        for callSet, accu in setQuals.items():
+            highs, highRecords, firstMissing = accu[4:]
+            h = bisect.bisect_left(highs, threshold)
+            firsts = highRecords[h:h + 1]
+            if withMissing and firstMissing is not None:
+                firsts.append(firstMissing)
+            if firsts:
+                found.append((min(firsts), callSet))
+        # insert the sets in the order a single --qual run finds them
+        found.sort()
+        callerSets = {}
+        callerSetsAnno = {}
+        for _, callSet in found:
+            quals, annoQuals, iMissing, iMissingAnno = setQuals[callSet][:4]
+            callerSets[callSet] = count_ge(quals, threshold) + (
+                iMissing if withMissing else 0
+            )
+            callerSetsAnno[callSet] = count_ge(annoQuals, threshold) + (
+                iMissingAnno if withMissing else 0
+            )
+        iConsidered = sum(callerSets.values())
+        iDroppedEff = count_ge(effQuals, threshold) + (
+            iEffMissing if withMissing else 0
+        )
+        iDroppedQual = i - iConsidered - iDroppedEff
+        success(
+            "QUAL >= {:g}: dropped due to QUAL: {}, dropped due to EFF: {}, combinations of callers: {}".format(
+                threshold, iDroppedQual, iDroppedEff, len(callerSets)
+            )
+        )
+        if args.infer:
+            infer_sets(callerSets)
+        tables.append(
+            (
+                "{:g}".format(threshold),
+                table_rows(callerSets, callerSetsAnno, iConsidered, args.sort),
+            )
+        )
+
+    write_tables(tables)
+    return
+
+
+SAMPLE_HEADER = "Set\tNumCallers\tSampledVars\tNumVars\tPctVars\tPctVarsLow\tPctVarsHigh\tNumAnno\tPctAnnotated\tPctAnnotatedLow\tPctAnnotatedHigh"
+
+
+def sample_stats(args, reg_genes=None):
+    """ Caller set table estimated from randomly chosen chunks of the file.
+
+    Each chunk is counted with its own SetCounter, the chunks are the
+    clusters of ratio_estimate() and total_estimate().
+    """
+    seed = args.seed
+    if seed is None:
+        seed = random.randrange(1 << 32)
+    try:
+        sampler = ChunkSampler(args.file, args.sample_fraction, seed)
+    except ValueError:
+        error(
+            '--sample-fraction needs an uncompressed or bgzip\'ed file, "{}" is not. EXIT.'.format(
+                args.file
+            )
+        )
+    info("Sampling seed: {}".format(seed))
+
+    need_info = bool(args.snpeffType)
+    counters = []
+    for lines in sampler:
+        counter = SetCounter(args.qual)
+        counter.update((parse_record(line, need_info) for line in lines), reg_genes)
+        counters.append(counter)
+    num = sampler.num
+    n = len(counters)
+    variants = [c.i for c in counters]
+    considered = [c.iConsidered for c in counters]
+
+    success(
+        "Sampled chunks: {} of {}, variants read: {}".format(n, num, sum(variants))
+    )
+    if n < 30:
+        warning(
+            "Only {} chunks sampled, the confidence intervals are rough.".format(n)
+        )
+    est, low, high = total_estimate(variants, num)
+    success(
+        "Estimated variants in file: {:.0f} (95% CI {} - {})".format(
+            est,
+            "NA" if low is None else "{:.0f}".format(low),
+            "NA" if high is None else "{:.0f}".format(high),
+        )
+    )
+    for name, dropped in [
+        ("QUAL", [c.iDroppedQual for c in counters]),
+        ("EFF", [c.iDroppedEff for c in counters]),
+    ]:
+        r, low, high = ratio_estimate(dropped, variants, num)
+        success(
+            "Estimated pct of variants dropped due to {}: {} (95% CI {} - {})".format(
+                name,
+                fmt_estimate(r, 100.0),
+                fmt_estimate(low, 100.0),
+                fmt_estimate(high, 100.0),
+            )
+        )
+
+    callerSets = {}
+    for counter in counters:
+        for callSet, k in counter.callerSets.items():
+            callerSets[callSet] = callerSets.get(callSet, 0) + k
+    success(
+        "Number of combination of callers found in sample: {}".format(len(callerSets))
+    )
+    if args.infer:
+        infer_sets(callerSets)
+
+    if args.sort:
+        callerSets_sorted = sorted(callerSets.items(), key=operator.itemgetter(0))
+    else:  # sort according to number of variants
+        callerSets_sorted = sorted(callerSets.items(), key=operator.itemgetter(1))
+        callerSets_sorted.reverse()
+
+    rows = []
+    for callSet, k in callerSets_sorted:
+        nums = [c.callerSets.get(callSet, 0) for c in counters]
+        annos = [c.callerSetsAnno.get(callSet, 0) for c in counters]
+        cset = "|".join(callSet)
+        numC = "-1" if cset == "Intersection" else len(callSet)
+        pct, pctLow, pctHigh = ratio_estimate(nums, considered, num)
+        pctanno, pctannoLow, pctannoHigh = ratio_estimate(annos, nums, num)
+        rows.append(
+            "\t".join(
+                str(v)
+                for v in (
+                    cset,
+                    numC,
+                    k,
+                    round(k * num / n),
+                    fmt_estimate(pct, 100.0),
+                    fmt_estimate(pctLow, 100.0),
+                    fmt_estimate(pctHigh, 100.0),
+                    round(sum(annos) * num / n),
+                    fmt_estimate(pctanno, 100.0),
+                    fmt_estimate(pctannoLow, 100.0),
+                    fmt_estimate(pctannoHigh, 100.0),
+                )
+            )
+        )
+
+    write_tables([(None, rows)], header=SAMPLE_HEADER)
+    return
+
+
+def main():
+    """ The main funtion. """
+    args, parser = parse_cmdline()
+
+    if args.snpeffType:
+        reg_genes = re.compile("\|(HIGH|MODERATE|LOW|MODIFIER)\|(.+?)\|")
+
+    reg_set = re.compile("set=(.+?)(?:;|$)")
+
+    if args.sample_fraction is not None:
+        if args.qual_sweep or args.follow or args.state:
+            error(
+                "--sample-fraction can not be combined with --qual-sweep, --follow or --state. EXIT."
+            )
+        if not 0 < args.sample_fraction <= 1:
+            error("--sample-fraction has to be in (0, 1]. EXIT.")
+        return sample_stats(args, reg_genes if args.snpeffType else None)
+
+    if args.follow or args.state:
+        if args.qual_sweep:
+            error("--follow/--state and --qual-sweep can not be combined. EXIT.")
+        return follow(args, reg_genes if args.snpeffType else None)
+
+    if is_plain_file(args.file):
+        records = iter_mmap_records(args.file, need_info=bool(args.snpeffType))
+    else:
+        try:
+            fileobj = load_file(args.file)
+        except IOError:
+            error('Could not load file "{}". EXIT.'.format(args.file))
+        records = iter_csv_records(fileobj, reg_set)
+
+    if args.qual_sweep:
+        if args.qual != 0.0:
+            error("--qual and --qual-sweep can not be combined. EXIT.")
+        return qual_sweep(args, records, reg_genes if args.snpeffType else None)
+
+    counter = SetCounter(args.qual)
+    counter.update(records, reg_genes if args.snpeffType else None)
+    counter.report(args)
     return
 
 
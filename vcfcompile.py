@@ -30,6 +30,11 @@ TODO
 VERSION HISTORY
 ===============
 
+0.0.7    2026/10/18    Per-sample FORMAT values with --format-key.
+0.0.6    2026/10/18    Checkpointed, resumable runs.
+0.0.5    2026/10/18    Exact pairwise overlap matrix from membership bitsets.
+0.0.4    2026/10/18    Approximate overlap matrix from MinHash/HyperLogLog sketches.
+0.0.3    2026/10/18    Bytes-level mmap parsing of uncompressed vcf-files.
 0.0.2    2019/01/10    Fixed error: _csv.Error: field larger than field limit (131072)
 0.0.1    2018          Initial version.
 
@@ -52,12 +57,22 @@ import time
 import re
 import operator
 import logging
+import math
+import mmap
+import array
+import hashlib
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'src'))
+from common import is_plain_file, open_seekable, file_stamp, \
+    save_checkpoint, load_checkpoint, popcount
 
 
 csv.field_size_limit(sys.maxsize)
 
-__version__ = '0.0.2'
-__date__ = '2019/01/10'
+__version__ = '0.0.7'
+__date__ = '2026/10/18'
 __email__ = 's.schmeier@gmail.com'
 __author__ = 'Sebastian Schmeier'
 
@@ -73,8 +88,9 @@ try:
               'warning': Fore.YELLOW,
               'info': ''}
 except ImportError:
-    sys.stderr.write('colorama lib desirable. ' +
-                     'Install with "conda install colorama".\n\n')
+    if __name__ == '__main__':  # not when imported by vcfqc.py
+        sys.stderr.write('colorama lib desirable. ' +
+                         'Install with "conda install colorama".\n\n')
     reset = ''
     colors = {'success': '', 'error': '', 'warning': '', 'info': ''}
 
@@ -156,6 +172,55 @@ def parse_cmdline():
         default=False,
         help='Do not throw an exception if the value could not be extracted '+ \
         ' from a vcf line. Instead only print warning to stderr.')
+    parser.add_argument('--format-key',
+        metavar='KEYS',
+        default=None,
+        help='Comma-separated FORMAT keys, e.g. GT,DP,GQ. Adds a column ' + \
+        'per file and sample with the values of these keys joined by ":" ' + \
+        '("." if a key is missing, "-" if the variant is not in the file). ' + \
+        '[default: no sample columns]')
+    parser.add_argument('--overlap-matrix',
+        metavar='FILE',
+        default=None,
+        help='Write exact pairwise numbers of shared variants and Jaccard ' + \
+        'indices of the files to FILE. [default: not written]')
+    parser.add_argument('--checkpoint',
+        metavar='FILE',
+        default=None,
+        help='Periodically save the input position and the variants ' + \
+        'compiled so far to FILE and resume from it if the run is ' + \
+        'restarted with the same arguments. FILE is removed when done. ' + \
+        '[default: no checkpoints]')
+    parser.add_argument('--checkpoint-interval',
+        metavar='SECONDS',
+        type=float,
+        default=300.0,
+        help='Minimum number of seconds between checkpoints. Each ' + \
+        'checkpoint writes all variants compiled so far. [default=300]')
+    parser.add_argument('--sketch',
+        action="store_true",
+        default=False,
+        help='Instead of the variant table print an approximate pairwise ' + \
+        'matrix of the files from fixed-size MinHash and HyperLogLog ' + \
+        'sketches of their variants (CHROM, POS, ID, REF, ALT). Memory is ' + \
+        'bounded by the sketch size, not the number of variants.')
+    parser.add_argument('--sketch-size',
+        metavar='INT',
+        type=int,
+        default=1024,
+        help='Number of MinHash bins per file. The error of the Jaccard ' + \
+        'index is about 1/sqrt(INT). [default=1024]')
+    parser.add_argument('--sketch-dir',
+        metavar='DIR',
+        default=None,
+        help='Store the sketches in DIR and reuse them for unchanged ' + \
+        'files of the same sketch size. [default: not stored]')
+    parser.add_argument('--sketch-stat',
+        choices=['jaccard', 'overlap'],
+        default='jaccard',
+        help='Value of the --sketch matrix: Jaccard index or estimated ' + \
+        'number of shared variants (diagonal: estimated number of ' + \
+        'variants). [default="jaccard"]')
     
     # if no arguments supplied print help
     if len(sys.argv) == 1:
@@ -181,90 +246,386 @@ def load_file(filename):
     return filehandle
 
 
-def main():
-    """ The main funtion. """
-    #logger = logging.getLogger(__name__)
-    args, parser = parse_cmdline()
-
-    if len(args.files) == 1:
-        error("Script expects at least two files. EXIT.")
-
-    if not args.snpeffType:
-        reg_genes = re.compile("\|(HIGH|MODERATE|LOW|MODIFIER)\|(.+?)\|")
-    else:
-        reg_genes = re.compile("\|({})\|(.+?)\|".format(args.snpeffType))
-    
-    reg_ann = re.compile(";{}=(.+?);".format(args.ann))
-        
-    variants = {}
-    allvars = {}
-    basenames = []
-    for f in args.files:
-        try:
-            fileobj = load_file(f)
-        except IOError:
-            error('Could not load file "{}". EXIT.'.format(f))
-
-        basename = os.path.basename(f)
-        if basename not in variants:
-            variants[basename] = {}
-            basenames.append(basename)
-        # delimited file handler
-        csv_reader_obj = csv.reader(fileobj, delimiter="\t", quoting=csv.QUOTE_NONE)
-        i = 0
-        for a in csv_reader_obj:
-            i += 1
-            if a[0][0] == "#":  # comment
+def parse_line(line, pattern, need_info=False):
+    """ Parse a vcf data line given as bytes.
+
+    Returns (fields, value, info), see iter_mmap_records().
+    """
+    # CHROM ... QUAL are decoded in one go, INFO is located in the rest
+    # without splitting off FORMAT and the samples
+    cols = line.split(b'\t', 6)
+    if len(cols) < 7:
+        fields = line.decode().split('\t')
+        fields.extend([''] * (6 - len(fields)))
+        return fields, None, '' if need_info else None
+    rest = cols[6]
+    fields = line[:len(line) - len(rest) - 1].decode().split('\t')
+
+    value = None
+    info = None
+    s = rest.find(b'\t') + 1  # start of INFO
+    if s:
+        e = rest.find(b'\t', s)
+        if e == -1:
+            e = len(rest)
+        v = -1
+        if pattern is not None:
+            v = rest.find(pattern, s, e)
+        if v != -1:
+            v += len(pattern)
+            end = rest.find(b';', v + 1, e)
+            if end != -1:
+                value = rest[v:end].decode()
+        if need_info:
+            info = rest[s:e].decode()
+    elif need_info:
+        info = ''
+    return fields, value, info
+
+
+def iter_mmap_records(filename, key, need_info=False, start=0, lineno=0,
+                      state=None):
+    """ Bytes-level reading of an uncompressed vcf-file.
+
+    The file is mmap'ed and lines are handled as bytes. Columns are split
+    off with a bounded bytes.split() and the INFO key is located with
+    bytes.find(), so only the values actually used get decoded.
+
+    Yields (lineno, fields, value, info, line) for every line. For header
+    lines fields is None. Otherwise fields holds the decoded CHROM, POS, ID,
+    REF, ALT and QUAL columns, value is the INFO value of key (same
+    semantics as the regex ";key=(.+?);") or None if not found or key is
+    None, info is the decoded INFO column if need_info is set (None
+    otherwise) and line is the raw line as bytes without line terminator.
+
+    Reading starts at byte offset start with line number lineno. If state
+    is a dict, state["offset"] and state["lineno"] are set to the position
+    of the start of the yielded line, i.e. resuming there yields it again.
+    """
+    pattern = None if key is None else ';{}='.format(key).encode()
+    with open(filename, 'rb') as fh:
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        mm.seek(start)
+        for line in iter(mm.readline, b''):
+            if state is not None:
+                state['offset'] = mm.tell() - len(line)
+                state['lineno'] = lineno
+            line = line.rstrip(b'\r\n')
+            lineno += 1
+            if not line:
                 continue
-            tVariant = tuple(a[0:5])
-            allvars[tVariant] = allvars.get(tVariant,0) + 1
-
-            if args.snpeff:
-                res_genes = reg_genes.findall(a[7])
-                # run through SNPeff?
-                if not res_genes:
-                    sys.stderr.write("{}\n".format('\t'.join(a)))
-                    error("Could not extract genes. " + \
-                          "Was your vcf-file {} annotated " + \
-                          "with SnpEff? EXIT.".format(f))
-                if args.snpeffType:
-                    res_genes = ['{}'.format(t[1]) for t in list(set(res_genes))]
-                else:
-                    res_genes = ['{}:{}'.format(t[1], t[0]) for t in list(set(res_genes))]
-                res_genes = list(set(res_genes))
-                res_genes.sort()
-                res_genes = ';'.join(res_genes)
-            else:
-                res_genes = "-"
-
-            if args.qual:
-                ann = a[5]
-            else:
-                ann = reg_ann.search(a[7])
-                if not ann:
-                    outstr = 'Could not find "{}" value:\nFile: '.format(args.ann) + \
-                             '"{}"\nLine ({}): {}'.format(f,i,'\t'.join(a))
-                    if args.warn:
-                        warning(outstr)
-                        warning('Set value to for variant in file {} to "-".'.format(f))
-                        ann = "-"
-                    else:
-                        error(outstr)                       
-                else:
-                    ann = ann.group(1)
+            if line[0] == 35:  # "#" comment
+                yield lineno, None, None, None, line
+                continue
+            fields, value, info = parse_line(line, pattern, need_info)
+            yield lineno, fields, value, info, line
+    finally:
+        mm.close()
 
-            variants[basename][tVariant] = (ann, res_genes) 
 
-        success("{}: {} variants found".format(basename, len(variants[basename])))
-    success("Number of unique variants: {}".format(len(allvars)))
+def iter_stream_records(filename, key, need_info=False, start=0, lineno=0,
+                        state=None):
+    """ Like iter_mmap_records(), for files read through open_seekable().
 
+    Positions in state are the ones of tell() of that file object.
+    """
+    pattern = None if key is None else ';{}='.format(key).encode()
+    fh = open_seekable(filename)
+    try:
+        if start:
+            fh.seek(start)
+        while True:
+            if state is not None:
+                state['offset'] = fh.tell()
+                state['lineno'] = lineno
+            line = fh.readline()
+            if not line:
+                break
+            line = line.rstrip(b'\r\n')
+            lineno += 1
+            if not line:
+                continue
+            if line[0] == 35:  # "#" comment
+                yield lineno, None, None, None, line
+                continue
+            fields, value, info = parse_line(line, pattern, need_info)
+            yield lineno, fields, value, info, line
+    finally:
+        fh.close()
+
+
+def iter_csv_records(fileobj, reg_ann):
+    """ Text-mode reading of a vcf-file with the csv module.
+
+    Yields the same (lineno, fields, value, info, line) records as
+    iter_mmap_records(), with line being the list of columns.
+    """
+    # delimited file handler
+    csv_reader_obj = csv.reader(fileobj, delimiter="\t", quoting=csv.QUOTE_NONE)
+    i = 0
+    for a in csv_reader_obj:
+        i += 1
+        if a[0][0] == "#":  # comment
+            yield i, None, None, None, a
+            continue
+        value = None
+        if reg_ann:
+            res = reg_ann.search(a[7])
+            if res:
+                value = res.group(1)
+        yield i, a, value, a[7], a
+
+
+def line_str(line):
+    """ Printable line of a record from iter_*_records(). """
+    if isinstance(line, bytes):
+        return line.decode()
+    return '\t'.join(line)
+
+
+def sample_names(line):
+    """ Sample names of a "#CHROM" header line from iter_*_records(). """
+    if isinstance(line, bytes):
+        line = line.decode().split('\t')
+    return line[9:]
+
+
+def format_values(fmt, samples, keys, cache):
+    """ Values of keys for each sample, as strings joined by ":".
+
+    fmt is the FORMAT column and samples a sequence of sample columns,
+    both bytes or both str like keys. Keys not in fmt and dropped trailing
+    fields give ".".
+
+    The lookup of keys in fmt is done once per distinct FORMAT string and
+    kept in cache. Sample columns are split only up to the last needed key,
+    after adding a "." field in front (for keys not in fmt) and enough "."
+    fields at the end (for dropped trailing fields), so that the values
+    can be taken with one itemgetter.
+    """
+    lookup = cache.get(fmt)
+    if lookup is None:
+        if isinstance(fmt, bytes):
+            colon, dot = b':', b'.'
+        else:
+            colon, dot = ':', '.'
+        names = fmt.split(colon)
+        idx = [names.index(k) + 1 if k in names else 0 for k in keys]
+        width = max(idx)
+        get = operator.itemgetter(*idx)
+        if len(idx) == 1:  # itemgetter of a single item gives no tuple
+            get = lambda parts, get=get: (get(parts),)
+        lookup = (colon, dot + colon, (colon + dot) * width, width, get,
+                  idx == [1])
+        cache[fmt] = lookup
+    colon, prefix, pad, width, get, first = lookup
+    if first:  # e.g. only GT, always first
+        return [sample.split(colon, 1)[0] for sample in samples]
+    return [colon.join(get((prefix + sample + pad).split(colon, width + 1)))
+            for sample in samples]
+
+
+def extract_genes(info, reg_genes, snpeffType=None):
+    """ Sorted, ";"-joined SnpEff genes of an INFO column, None if none. """
+    res_genes = reg_genes.findall(info)
+    if not res_genes:
+        return None
+    if snpeffType:
+        res_genes = ['{}'.format(t[1]) for t in list(set(res_genes))]
+    else:
+        res_genes = ['{}:{}'.format(t[1], t[0]) for t in list(set(res_genes))]
+    res_genes = list(set(res_genes))
+    res_genes.sort()
+    return ';'.join(res_genes)
+
+
+def table_entry(f, i, fields, value, info, line, ann, warn=False,
+                reg_genes=None, snpeffType=None):
+    """ The (value, genes) of a record from iter_*_records() for the table.
+
+    With ann None the QUAL column is the value, else the INFO value of ann
+    ("-" with warn if not found). Genes are extracted from info with
+    reg_genes, "-" without.
+    """
+    if reg_genes is not None:
+        res_genes = extract_genes(info, reg_genes, snpeffType)
+        # run through SNPeff?
+        if res_genes is None:
+            sys.stderr.write("{}\n".format(line_str(line)))
+            error("Could not extract genes. " + \
+                  "Was your vcf-file {} annotated ".format(f) + \
+                  "with SnpEff? EXIT.")
+    else:
+        res_genes = "-"
+
+    if ann is None:
+        return fields[5], res_genes
+    if value is None:
+        outstr = 'Could not find "{}" value:\nFile: '.format(ann) + \
+                 '"{}"\nLine ({}): {}'.format(f, i, line_str(line))
+        if warn:
+            warning(outstr)
+            warning('Set value to for variant in file {} to "-".'.format(f))
+            value = "-"
+        else:
+            error(outstr)
+    return value, res_genes
+
+
+def write_overlap_matrix(filename, basenames, membership):
+    """ Write shared variants and Jaccard index for all pairs of files.
+
+    membership maps each variant to an int with bit j set if the variant
+    is in file j. It is transposed into one bitset over the variants per
+    file, so a pair is a single AND and popcount.
+    """
+    filebits = [bytearray((len(membership) + 7) // 8) for f in basenames]
+    for v, members in enumerate(membership.values()):
+        while members:
+            low = members & -members
+            filebits[low.bit_length() - 1][v >> 3] |= 1 << (v & 7)
+            members ^= low
+    filebits = [int.from_bytes(bits, 'little') for bits in filebits]
+    counts = [popcount(bits) for bits in filebits]
 
+    try:
+        outfileobj = open(filename, 'w')
+    except IOError:
+        error('Could not write file "{}". EXIT.'.format(filename))
+    outfileobj.write("FILE1\tFILE2\tNUM1\tNUM2\tSHARED\tJACCARD\n")
+    for a in range(len(basenames)):
+        for b in range(a + 1, len(basenames)):
+            shared = popcount(filebits[a] & filebits[b])
+            union = counts[a] + counts[b] - shared
+            jaccard = shared / union if union else 0.0
+            outfileobj.write("{}\t{}\t{}\t{}\t{}\t{}\n".format(
+                basenames[a], basenames[b], counts[a], counts[b], shared,
+                jaccard))
+    outfileobj.close()
+    success('Overlap matrix written to "{}"'.format(filename))
+
+
+SKETCH_MAGIC = 'vcfcompile-sketch'
+SKETCH_EMPTY = 2 ** 64 - 1
+HLL_P = 12  # HyperLogLog with 2**12 registers, ~1.6% error
+
+
+class Sketch(object):
+    """ MinHash and HyperLogLog sketch of the variants of a file.
+
+    MinHash uses one permutation hashing: the 64-bit hash of a variant
+    picks one of size bins by its upper 32 bits and the bin keeps the
+    minimum of the lower 32 bits. The HyperLogLog registers estimate the
+    number of distinct variants. Both have a fixed size.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.mins = array.array('Q', [SKETCH_EMPTY]) * size
+        self.registers = bytearray(2 ** HLL_P)
+        self.records = 0
+
+    def add(self, key):
+        h = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(),
+                           'little')
+        self.records += 1
+        b = ((h >> 32) * self.size) >> 32
+        v = h & 0xffffffff
+        if v < self.mins[b]:
+            self.mins[b] = v
+        r = h >> (64 - HLL_P)
+        # rank of the first set bit of the remaining bits
+        rank = (64 - HLL_P) - (h & ((1 << (64 - HLL_P)) - 1)).bit_length() + 1
+        if rank > self.registers[r]:
+            self.registers[r] = rank
+
+    def cardinality(self):
+        """ HyperLogLog estimate of the number of distinct variants. """
+        m = len(self.registers)
+        est = (0.7213 / (1 + 1.079 / m)) * m * m / \
+            sum(2.0 ** -x for x in self.registers)
+        zeros = self.registers.count(0)
+        if est <= 2.5 * m and zeros:
+            est = m * math.log(m / zeros)  # linear counting
+        return est
+
+    def signature(self):
+        """ Densified bin minima packed as one byte per bin (b-bit MinHash).
+
+        Empty bins borrow the minimum of the next non-empty bin, mixed with
+        the distance, so the same bins are comparable between files.
+        """
+        size = self.size
+        mins = self.mins
+        filled = [b for b in range(size) if mins[b] != SKETCH_EMPTY]
+        if not filled:
+            return bytes(size)
+        sig = bytearray(size)
+        nxt = filled[0] + size
+        for b in range(size - 1, -1, -1):
+            if mins[b] != SKETCH_EMPTY:
+                nxt = b
+            dist = nxt - b
+            sig[b] = (mins[nxt % size] + dist * 0x9E3779B1) & 0xff
+        return bytes(sig)
+
+    def save(self, filename, source):
+        stat = os.stat(source)
+        header = {'magic': SKETCH_MAGIC, 'size': self.size, 'hll_p': HLL_P,
+                  'records': self.records, 'source_size': stat.st_size,
+                  'source_mtime': stat.st_mtime}
+        with open(filename, 'wb') as fh:
+            fh.write('{}\n'.format(json.dumps(header)).encode())
+            self.mins.tofile(fh)
+            fh.write(self.registers)
+
+    @classmethod
+    def load(cls, filename, source, size):
+        """ Load a stored sketch, None if missing or stale. """
+        try:
+            with open(filename, 'rb') as fh:
+                header = json.loads(fh.readline().decode())
+                stat = os.stat(source)
+                if header.get('magic') != SKETCH_MAGIC or \
+                   header['size'] != size or header['hll_p'] != HLL_P or \
+                   header['source_size'] != stat.st_size or \
+                   header['source_mtime'] != stat.st_mtime:
+                    return None
+                sketch = cls(size)
+                sketch.records = header['records']
+                sketch.mins = array.array('Q')
+                sketch.mins.fromfile(fh, size)
+                sketch.registers = bytearray(fh.read(2 ** HLL_P))
+                if len(sketch.registers) != 2 ** HLL_P:
+                    return None  # truncated
+        except (IOError, OSError, ValueError, EOFError):
+            return None
+        return sketch
+
+
+def write_table(outfileobj, basenames, variants, allvars, samples=None,
+                formats=None):
+    """ Write the variant table.
+
+    variants maps each file to {variant: (annotation, genes)} and allvars
+    each variant to the number of files it was found in. With samples
+    (file -> sample names) and formats (file -> {variant: sample values})
+    a column per file and sample is added.
+    """
     header = "CHROM\tPOS\tID\tREF\tALT\tGENES\t{}".format('\t'.join(basenames))
+    if samples is not None:
+        for f in basenames:
+            if not samples[f]:
+                warning('No samples found in "{}".'.format(f))
+            header += ''.join(['\t{}:{}'.format(f, sample)
+                               for sample in samples[f]])
+        # placeholder for files without the variant
+        absent = dict([(f, '\t'.join(['-'] * len(samples[f])))
+                       for f in basenames])
 
     allvars_sorted = sorted(allvars.items(), key=operator.itemgetter(1))
     allvars_sorted.reverse()
 
-    outfileobj = sys.stdout
     # For printing to stdout
     # SIGPIPE is throwing exception when piping output to other tools
     # like head. => http://docs.python.org/library/signal.html
@@ -283,6 +644,10 @@ def main():
                     qd = "-"
                     
                 fqds.append(qd)
+            if samples is not None:
+                for f in basenames:
+                    if samples[f]:
+                        fqds.append(formats[f].get(var, absent[f]))
             fqds = '\t'.join(fqds)
             outfileobj.write("{}\t{}\t{}\t{}\t{}\t{}\t{}\n".format(var[0],
                                                                    var[1],
@@ -293,6 +658,106 @@ def main():
                                                                    fqds))
         # flush output here to force SIGPIPE to be triggered
         # while inside this try block.
+        outfileobj.flush()
+    except BrokenPipeError:
+        # Python flushes standard streams on exit; redirect remaining output
+        # to devnull to avoid another BrokenPipeError at shut-down
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)  # Python exits with error code 1 on EPIPE
+
+
+
+def sketch_file(f, size):
+    """ Stream a vcf-file once into a Sketch. """
+    if is_plain_file(f):
+        records = iter_mmap_records(f, None)
+    else:
+        try:
+            fileobj = load_file(f)
+        except IOError:
+            error('Could not load file "{}". EXIT.'.format(f))
+        records = iter_csv_records(fileobj, None)
+    sketch = Sketch(size)
+    for i, fields, value, info, line in records:
+        if fields is None:  # comment
+            continue
+        sketch.add('\t'.join(fields[0:5]).encode())
+    return sketch
+
+
+def sketch_filename(f):
+    """ Name of the stored sketch of a file in --sketch-dir.
+
+    Includes a hash of the absolute path, so files with the same name in
+    different directories do not overwrite each other's sketch.
+    """
+    digest = hashlib.sha1(os.path.abspath(f).encode()).hexdigest()[:16]
+    return '{}.{}.sketch'.format(os.path.basename(f), digest)
+
+
+def sketch_main(args):
+    """ Print an approximate pairwise matrix of the files from sketches. """
+    if args.sketch_size < 1:
+        error("--sketch-size must be at least 1. EXIT.")
+    if args.sketch_dir and not os.path.isdir(args.sketch_dir):
+        os.makedirs(args.sketch_dir)
+
+    basenames = []
+    signatures = []
+    cardinalities = []
+    for f in args.files:
+        basename = os.path.basename(f)
+        sketch = None
+        # standard input can not be recognised again on a later run
+        sketchfile = None
+        if args.sketch_dir and f not in ['-', 'stdin']:
+            sketchfile = os.path.join(args.sketch_dir,
+                                      sketch_filename(f))
+            sketch = Sketch.load(sketchfile, f, args.sketch_size)
+        if sketch is None:
+            sketch = sketch_file(f, args.sketch_size)
+            if sketchfile:
+                sketch.save(sketchfile, f)
+            success("{}: {} variants sketched".format(basename, sketch.records))
+        else:
+            success("{}: sketch loaded".format(basename))
+        basenames.append(basename)
+        # packed signature as int, so pairs are compared with one XOR
+        signatures.append(int.from_bytes(sketch.signature(), 'little'))
+        cardinalities.append(sketch.cardinality())
+
+    size = args.sketch_size
+    collision = 1.0 / 256  # chance of equal bytes for different minima
+    fmt = '{:.4f}' if args.sketch_stat == 'jaccard' else '{:.0f}'
+
+    outfileobj = sys.stdout
+    # For printing to stdout
+    # SIGPIPE is throwing exception when piping output to other tools
+    # like head. => http://docs.python.org/library/signal.html
+    # use a try - except clause to handle
+    try:
+        outfileobj.write("FILE\t{}\n".format('\t'.join(basenames)))
+        # rows are computed one at a time to keep memory linear in files
+        for a, basename in enumerate(basenames):
+            row = []
+            for b in range(len(basenames)):
+                if a == b:
+                    row.append(1.0 if args.sketch_stat == 'jaccard'
+                               else cardinalities[a])
+                    continue
+                equal = (signatures[a] ^ signatures[b]).to_bytes(
+                    size, 'little').count(0)
+                jaccard = max(0.0, (equal / size - collision) / (1 - collision))
+                if args.sketch_stat == 'jaccard':
+                    row.append(jaccard)
+                else:
+                    row.append(jaccard / (1 + jaccard) *
+                               (cardinalities[a] + cardinalities[b]))
+            outfileobj.write("{}\t{}\n".format(
+                basename, '\t'.join([fmt.format(x) for x in row])))
+        # flush output here to force SIGPIPE to be triggered
+        # while inside this try block.
         sys.stdout.flush()
     except BrokenPipeError:
         # Python flushes standard streams on exit; redirect remaining output
@@ -300,6 +765,181 @@ def main():
         devnull = os.open(os.devnull, os.O_WRONLY)
         os.dup2(devnull, sys.stdout.fileno())
         sys.exit(1)  # Python exits with error code 1 on EPIPE
+    return
+
+
+def main():
+    """ The main funtion. """
+    #logger = logging.getLogger(__name__)
+    args, parser = parse_cmdline()
+
+    if len(args.files) == 1:
+        error("Script expects at least two files. EXIT.")
+
+    if args.sketch:
+        # options of the variant table only
+        if args.format_key or args.overlap_matrix or args.checkpoint or \
+           args.snpeff or args.qual or args.ann != 'QD':
+            error("--sketch can not be combined with --format-key, " + \
+                  "--overlap-matrix, --checkpoint, --snpeff, --qual or " + \
+                  "--ann. EXIT.")
+        return sketch_main(args)
+
+    if not args.snpeffType:
+        reg_genes = re.compile("\|(HIGH|MODERATE|LOW|MODIFIER)\|(.+?)\|")
+    else:
+        reg_genes = re.compile("\|({})\|(.+?)\|".format(args.snpeffType))
+    
+    if args.qual:
+        key = None
+        reg_ann = None
+    else:
+        key = args.ann
+        reg_ann = re.compile(";{}=(.+?);".format(args.ann))
+        
+    format_keys = None
+    if args.format_key:
+        format_keys = [k for k in args.format_key.split(',') if k]
+        format_keys_bytes = [k.encode() for k in format_keys]
+    format_cache = {}
+
+    variants = {}
+    allvars = {}
+    membership = {}  # variant -> bitset of files
+    samples = {}  # file -> sample names
+    formats = {}  # file -> variant -> tab-separated sample values
+    basenames = []
+    fstart = 0  # index of first file to read
+    offset = 0  # position in that file
+    lineno = 0
+    if args.checkpoint:
+        if any(f in ['-', 'stdin'] for f in args.files):
+            error('Can not checkpoint standard input. EXIT.')
+        # everything that changes the compiled table
+        signature = {'files': [(f, file_stamp(f)) for f in args.files],
+                     'ann': args.ann, 'qual': args.qual,
+                     'snpeff': args.snpeff, 'snpeffType': args.snpeffType,
+                     'warn': args.warn,
+                     'overlap': bool(args.overlap_matrix),
+                     'format': args.format_key}
+        try:
+            checkpoint = load_checkpoint(args.checkpoint, signature)
+        except ValueError as e:
+            warning('{} Start from scratch.'.format(e))
+            checkpoint = None
+        if checkpoint:
+            info('Resume from checkpoint "{}".'.format(args.checkpoint))
+            variants = checkpoint['variants']
+            allvars = checkpoint['allvars']
+            membership = checkpoint['membership']
+            samples = checkpoint['samples']
+            formats = checkpoint['formats']
+            basenames = checkpoint['basenames']
+            fstart = checkpoint['file']
+            offset = checkpoint['offset']
+            lineno = checkpoint['lineno']
+        last_checkpoint = time.monotonic()
+    iRecords = 0
+    # looked up once instead of for every variant
+    reg_table = reg_genes if args.snpeff else None
+    overlap = args.overlap_matrix
+
+    for fi in range(fstart, len(args.files)):
+        f = args.files[fi]
+        # the position is only tracked for checkpoints
+        state = {'offset': offset, 'lineno': lineno} \
+            if args.checkpoint else None
+        if is_plain_file(f):
+            records = iter_mmap_records(f, key, need_info=args.snpeff,
+                                        start=offset, lineno=lineno,
+                                        state=state)
+        elif args.checkpoint:
+            try:
+                records = iter_stream_records(f, key, need_info=args.snpeff,
+                                              start=offset, lineno=lineno,
+                                              state=state)
+            except IOError:
+                error('Could not load file "{}". EXIT.'.format(f))
+        else:
+            try:
+                fileobj = load_file(f)
+            except IOError:
+                error('Could not load file "{}". EXIT.'.format(f))
+            records = iter_csv_records(fileobj, reg_ann)
+        offset = 0
+        lineno = 0
+
+        basename = os.path.basename(f)
+        if basename not in variants:
+            variants[basename] = {}
+            basenames.append(basename)
+            samples[basename] = []
+            formats[basename] = {}
+        filebit = 1 << basenames.index(basename)
+        table = variants[basename]
+
+        for i, fields, value, infostr, line in records:
+            if fields is None:  # comment
+                if format_keys and line_str(line).startswith('#CHROM'):
+                    samples[basename] = sample_names(line)
+                continue
+
+            # only look at the clock every 4096 variants
+            iRecords += 1
+            if args.checkpoint and iRecords & 4095 == 0 and \
+               time.monotonic() - last_checkpoint >= args.checkpoint_interval:
+                # everything before this variant is compiled, so resume at
+                # the start of its line
+                save_checkpoint(args.checkpoint,
+                                {'signature': signature, 'variants': variants,
+                                 'allvars': allvars, 'membership': membership,
+                                 'samples': samples, 'formats': formats,
+                                 'basenames': basenames, 'file': fi,
+                                 'offset': state['offset'],
+                                 'lineno': state['lineno']})
+                last_checkpoint = time.monotonic()
+
+            tVariant = tuple(fields[0:5])
+            allvars[tVariant] = allvars.get(tVariant,0) + 1
+            if overlap:
+                membership[tVariant] = membership.get(tVariant, 0) | filebit
+
+            table[tVariant] = table_entry(
+                f, i, fields, value, infostr, line, key, args.warn,
+                reg_table, args.snpeffType)
+
+            if format_keys and samples[basename]:
+                if isinstance(line, bytes):
+                    # FORMAT and the sample columns are split off only here
+                    cols = line.split(b'\t')
+                    fkeys = format_keys_bytes
+                else:
+                    cols = line
+                    fkeys = format_keys
+                if len(cols) - 9 != len(samples[basename]):
+                    error('Number of sample columns does not match the ' + \
+                          'header:\nFile: "{}"\nLine ({}): {}'.format(
+                              f, i, line_str(line)))
+                values = format_values(cols[8], cols[9:], fkeys, format_cache)
+                if isinstance(line, bytes):
+                    formats[basename][tVariant] = b'\t'.join(values).decode()
+                else:
+                    formats[basename][tVariant] = '\t'.join(values)
+
+        success("{}: {} variants found".format(basename, len(variants[basename])))
+    success("Number of unique variants: {}".format(len(allvars)))
+
+    if args.overlap_matrix:
+        write_overlap_matrix(args.overlap_matrix, basenames, membership)
+
+
+    outfileobj = sys.stdout
+    write_table(outfileobj, basenames, variants, allvars,
+                samples if format_keys else None, formats)
+
+    if args.checkpoint and os.path.isfile(args.checkpoint):
+        # table written, a restart should start from scratch
+        os.remove(args.checkpoint)
 
     # ------------------------------------------------------
     outfileobj.close()
@@ -0,0 +1,428 @@
+#!/usr/bin/env python
+"""
+NAME: vcfqc.py
+==============
+
+DESCRIPTION
+===========
+
+Read vcf-files once and compile the reports of
+src/vcffilter.py, vcfSetStats.py and vcfcompile.py
+for the variants passing the filters.
+
+INSTALLATION
+============
+
+Nothing special. Uses only standard libs and the other scripts
+of this repository.
+
+USAGE
+=====
+
+python vcfqc.py --setstats sets.tsv --compile table.tsv *.vcf.gz
+
+
+VERSION HISTORY
+===============
+
+0.0.1    2026/10/18    Initial version.
+
+LICENCE
+=======
+2018-2019, copyright Sebastian Schmeier
+s.schmeier@gmail.com // https://www.sschmeier.com
+
+template version: 2.0 (2018/12/19)
+"""
+import sys
+import os
+import os.path
+import argparse
+import io
+import gzip
+import bz2
+import re
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'src'))
+import vcffilter
+import vcfSetStats
+import vcfcompile
+from vcffilter import success, error, warning
+
+# the scripts above only ask for colorama when run on their own
+try:
+    import colorama
+except ImportError:
+    sys.stderr.write('colorama lib desirable. ' +
+                     'Install with "conda install colorama".\n\n')
+
+
+__version__ = '0.0.1'
+__date__ = '2026/10/18'
+__email__ = 's.schmeier@gmail.com'
+__author__ = 'Sebastian Schmeier'
+
+
+def parse_cmdline():
+    """ Parse command-line args. """
+    # parse cmd-line ----------------------------------------------------------
+    description = 'Read vcf-files once, filter them like src/vcffilter.py ' + \
+                  'and compile the reports of vcfSetStats.py and ' + \
+                  'vcfcompile.py for the passing variants. Each report ' + \
+                  'goes to its own file. Some stats go to standard error.'
+
+    version = 'version {}, date {}'.format(__version__, __date__)
+    epilog = 'Copyright {} ({})'.format(__author__, __email__)
+
+    parser = argparse.ArgumentParser(description=description, epilog=epilog)
+
+    parser.add_argument('--version',
+                        action='version',
+                        version='{}'.format(version))
+    parser.add_argument(
+        'files',
+        metavar='FILE',
+        nargs='+',
+        help='vcf-file.')
+    parser.add_argument('--QD',
+                        metavar='FLOAT',
+                        type=float,
+                        default=2.0,
+                        help='Filter on QD > FLOAT. [default=2.].')
+    parser.add_argument('--FS',
+                        metavar='FLOAT',
+                        type=float,
+                        default=30.,
+                        help='Filter on FS < FLOAT. [default=30.].')
+    parser.add_argument('--DP',
+                        metavar='FLOAT',
+                        type=float,
+                        default=10.,
+                        help='Filter on DP > FLOAT. [default=10.].')
+    parser.add_argument('--MQ',
+                        metavar='FLOAT',
+                        type=float,
+                        default=40.,
+                        help='Filter on MQ > FLOAT. [default=40.].')
+    parser.add_argument('--MQRankSum',
+                        metavar='FLOAT',
+                        type=float,
+                        default=-12.5,
+                        help='Filter on MQRankSum > FLOAT. [default=-12.5].')
+    parser.add_argument('--ReadPosRankSum',
+                        metavar='FLOAT',
+                        type=float,
+                        default=-8.0,
+                        help='Filter on ReadPosRankSum > FLOAT. [default=-8.0].')
+    parser.add_argument('--warn',
+        action="store_true",
+        default=False,
+        help='Do not throw an exception if a filter or --ann value could ' + \
+        'not be extracted from a vcf line. Instead only print warning to ' + \
+        'stderr, as vcffilter.py and vcfcompile.py do with --warn.')
+    parser.add_argument('--passed-dir',
+        metavar='DIR',
+        default=None,
+        help='Write the passing variants of each FILE to DIR/FILE, ' + \
+        'compressed like FILE. [default: not written]')
+    parser.add_argument('--setstats',
+        metavar='FILE',
+        default=None,
+        help='Write the caller set table of vcfSetStats.py to FILE. With ' + \
+        'several input files the tables get a leading File column. ' + \
+        '[default: not written]')
+    parser.add_argument('--setstats-qual',
+        metavar='NUMBER',
+        type=float,
+        default=0.0,
+        help='Only count variants with a QUAL value equal or greater ' + \
+        'than this value in --setstats, like --qual of vcfSetStats.py. ' + \
+        '[default = 0]')
+    parser.add_argument('--infer',
+        action="store_true",
+        default=False,
+        help='Infer all combinations of single callers in --setstats, ' + \
+        'see vcfSetStats.py.')
+    parser.add_argument('--sort',
+        action="store_true",
+        default=False,
+        help='Sort --setstats by combination names. [default: sorted by ' + \
+        'number of variants]')
+    parser.add_argument('--compile',
+        metavar='FILE',
+        default=None,
+        help='Write the variant table of vcfcompile.py to FILE. ' + \
+        '[default: not written]')
+    parser.add_argument('--ann',
+        metavar='TYPE',
+        default="QD",
+        help='Extract this value from the annotation line for --compile. ' + \
+        '[default="QD"]')
+    parser.add_argument('--snpeff',
+        action="store_true",
+        default=False,
+        help='Extract SnpEff effects on genes for --compile.')
+    parser.add_argument('--snpeffType',
+        metavar='TYPE',
+        default=None,
+        help='In --setstats only count variants with a SnpEff effect ' + \
+        'annotation, with --snpeff only extract genes with this SnpEff ' + \
+        'effect (HIGH, MODERATE, LOW, MODIFIER) for --compile, as ' + \
+        'vcfSetStats.py and vcfcompile.py do. [default: not considered]')
+    parser.add_argument('--queue-size',
+        metavar='INT',
+        type=int,
+        default=64,
+        help='Write --passed-dir files from background threads through ' + \
+        'queues holding at most INT batches of lines. 0 writes inline. ' + \
+        '[default = 64]')
+
+    # if no arguments supplied print help
+    if len(sys.argv) == 1:
+        parser.print_help()
+        sys.exit(1)
+
+    args = parser.parse_args()
+    return args, parser
+
+
+def iter_lines(filename):
+    """ Lines of a vcf-file as bytes, like vcffilter.iter_mmap_lines().
+
+    Uncompressed files are mmap'ed, compressed ones read in binary mode, so
+    nothing gets decoded.
+    """
+    if vcffilter.is_plain_file(filename):
+        for record in vcffilter.iter_mmap_lines(filename):
+            yield record
+        return
+
+    if filename in ['-', 'stdin']:
+        fileobj = sys.stdin.buffer
+    elif filename.split('.')[-1] == 'gz':
+        # readline() of GzipFile is pure Python; a large C buffer on top
+        # splits the lines much faster
+        fileobj = io.BufferedReader(gzip.open(filename, 'rb'), 1 << 20)
+    elif filename.split('.')[-1] == 'bz2':
+        fileobj = io.BufferedReader(bz2.open(filename, 'rb'), 1 << 20)
+    else:
+        fileobj = open(filename, 'rb')
+    lineno = 0
+    for line in fileobj:
+        lineno += 1
+        if line.endswith(b'\r\n'):
+            line = line[:-2] + b'\n'
+        elif not line.endswith(b'\n'):
+            line += b'\n'
+        if len(line) == 1:
+            continue
+        if line[0] == 35:  # "#" comment
+            yield lineno, None, line
+            continue
+        yield lineno, vcffilter.split_info(line), line
+    fileobj.close()
+
+
+def filter_lines(records, tests, warn, counts):
+    """ Header lines and the variants passing all tests.
+
+    tests are (name, search, threshold), evaluated by
+    vcffilter.test_variant(). counts ([variants, passed, failed, not
+    found]) are kept as by vcffilter.py.
+    """
+    for i, info, line in records:
+        if info is None:  # comment
+            yield i, info, line
+            continue
+
+        counts[0] += 1
+        fail, notfound = vcffilter.test_variant(i, info, line, tests, warn)
+        counts[2] += notfound
+        counts[3] += notfound
+        if not fail:
+            counts[1] += 1
+            yield i, info, line
+        else:
+            counts[2] += 1
+
+
+def write_lines(records, outfileobj):
+    """ Pass records through, writing their lines to outfileobj. """
+    for record in records:
+        outfileobj.write(record[2])
+        yield record
+
+
+class CompileTable(object):
+    """ The variant table of vcfcompile.py, filled record by record. """
+    def __init__(self, ann, snpeff=False, warn=False, snpeffType=None):
+        self.pattern = ';{}='.format(ann).encode()
+        self.ann = ann
+        self.snpeff = snpeff
+        self.warn = warn
+        self.snpeffType = snpeffType
+        if snpeffType:
+            self.reg_genes = re.compile(r"\|({})\|(.+?)\|".format(snpeffType))
+        else:
+            self.reg_genes = re.compile(r"\|(HIGH|MODERATE|LOW|MODIFIER)\|(.+?)\|")
+        self.basenames = []
+        self.variants = {}
+        self.allvars = {}
+
+    def records(self, records, filename):
+        """ Pass records through, adding their variants to the table. """
+        basename = os.path.basename(filename)
+        if basename not in self.variants:
+            self.variants[basename] = {}
+            self.basenames.append(basename)
+        variants = self.variants[basename]
+        allvars = self.allvars
+        for record in records:
+            i, info, line = record
+            if info is None:  # comment
+                yield record
+                continue
+
+            line = line[:-1]
+            fields, value, infostr = vcfcompile.parse_line(line, self.pattern,
+                                                            self.snpeff)
+            tVariant = tuple(fields[0:5])
+            allvars[tVariant] = allvars.get(tVariant, 0) + 1
+            variants[tVariant] = vcfcompile.table_entry(
+                filename, i, fields, value, infostr, line, self.ann,
+                self.warn, self.reg_genes if self.snpeff else None,
+                self.snpeffType)
+            yield record
+
+    def write(self, filename):
+        try:
+            outfileobj = open(filename, 'w')
+        except IOError:
+            error('Could not write file "{}". EXIT.'.format(filename))
+        success("Number of unique variants: {}".format(len(self.allvars)))
+        vcfcompile.write_table(outfileobj, self.basenames, self.variants,
+                               self.allvars)
+        outfileobj.close()
+
+
+def set_records(records, need_info=False):
+    """ vcfSetStats.py records of the variant lines of records. """
+    for i, info, line in records:
+        if info is not None:
+            yield vcfSetStats.parse_record(line[:-1], need_info)
+
+
+def main():
+    """ The main funtion. """
+    args, parser = parse_cmdline()
+
+    if not (args.passed_dir or args.setstats or args.compile):
+        error("Nothing to do, give at least one of --passed-dir, " + \
+              "--setstats and --compile. EXIT.")
+    if args.passed_dir and not os.path.isdir(args.passed_dir):
+        error('Directory "{}" does not exist. EXIT.'.format(args.passed_dir))
+    if args.passed_dir:
+        # the passed files are opened before their input is read
+        inputs = [f for f in args.files
+                  if f not in ['-', 'stdin'] and os.path.exists(f)]
+        basenames = set()
+        for f in args.files:
+            basename = os.path.basename(f)
+            if basename in basenames:
+                error('Several input files named "{}", '.format(basename) + \
+                      'their passed variants would go to the same file ' + \
+                      'in --passed-dir. EXIT.')
+            basenames.add(basename)
+            target = os.path.join(args.passed_dir, basename)
+            if os.path.exists(target) and \
+               any(os.path.samefile(target, g) for g in inputs):
+                error('Passed variants of "{}" would overwrite '.format(f) + \
+                      'the input file "{}". EXIT.'.format(target))
+
+    dict_tests = {"QD": args.QD,
+                  "DP": args.DP,
+                  "FS": args.FS,
+                  "MQ": args.MQ,
+                  "ReadPosRankSum": args.ReadPosRankSum,
+                  "MQRankSum": args.MQRankSum}
+    tests = [(name, vcffilter.make_search(name, True), dict_tests[name])
+             for name in ["QD", "DP", "FS", "MQ", "ReadPosRankSum",
+                          "MQRankSum"]]
+
+    table = None
+    if args.compile:
+        table = CompileTable(args.ann, args.snpeff, args.warn,
+                             args.snpeffType)
+    tables = []
+    set_genes = None
+    if args.snpeffType:
+        # any effect, as vcfSetStats.py does
+        set_genes = re.compile(r"\|(HIGH|MODERATE|LOW|MODIFIER)\|(.+?)\|")
+
+    for f in args.files:
+        counts = [0, 0, 0, 0]
+        records = filter_lines(iter_lines(f), tests, args.warn, counts)
+
+        if args.passed_dir:
+            outfileobj = vcffilter.open_output(
+                os.path.join(args.passed_dir, os.path.basename(f)), True)
+            if args.queue_size > 0:
+                outfileobj = vcffilter.ThreadedWriter(outfileobj,
+                                                      args.queue_size)
+            records = write_lines(records, outfileobj)
+        if table is not None:
+            records = table.records(records, f)
+
+        # everything happens while the records are consumed
+        try:
+            if args.setstats:
+                counter = vcfSetStats.SetCounter(args.setstats_qual)
+                counter.update(set_records(records, bool(args.snpeffType)),
+                               set_genes)
+            else:
+                for record in records:
+                    pass
+        except BaseException:
+            # error() or Ctrl-C: write out the queued lines and stop the
+            # writer thread
+            if args.passed_dir and args.queue_size > 0:
+                outfileobj.finish()
+            raise
+
+        if args.passed_dir:
+            outfileobj.close()
+
+        success("{}: Variants in file: {}".format(f, counts[0]))
+        success("{}: Variants passed all filters: {}".format(f, counts[1]))
+        success("{}: Variants failed at least one filter: {}".format(
+            f, counts[2]))
+        success("{}:   Of those at least one filter could not been found for: {}".format(
+            f, counts[3]))
+        if args.setstats:
+            success("{}: Number of variants dropped due to QUAL: {}".format(
+                f, counter.iDroppedQual))
+            if args.snpeffType:
+                success("{}: Number of variants dropped due to EFF: {}".format(
+                    f, counter.iDroppedEff))
+            callerSets = dict(counter.callerSets)
+            if args.infer:
+                vcfSetStats.infer_sets(callerSets)
+            label = os.path.basename(f) if len(args.files) > 1 else None
+            tables.append((label, vcfSetStats.table_rows(
+                callerSets, counter.callerSetsAnno, counter.iConsidered,
+                args.sort)))
+
+    if args.setstats:
+        try:
+            outfileobj = open(args.setstats, 'w')
+        except IOError:
+            error('Could not write file "{}". EXIT.'.format(args.setstats))
+        vcfSetStats.write_tables(tables, outfileobj=outfileobj, column="File")
+    if table is not None:
+        table.write(args.compile)
+    return
+
+
+if __name__ == '__main__':
+    sys.exit(main())